@@ -1,2 +1,12 @@
 VERSION = (0, 11)
 __version__ = '.'.join(map(str, VERSION))
+
+try:
+    import django
+except ImportError:
+    # e.g. while the package is being built
+    pass
+else:
+    if django.VERSION < (3, 2):
+        # app configs are only found automatically from Django 3.2
+        default_app_config = 'moj_irat.apps.MojIratConfig'
@@ -0,0 +1,19 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class MojIratConfig(AppConfig):
+    name = 'moj_irat'
+    verbose_name = 'IRaT support'
+
+    def ready(self):
+        if getattr(settings, 'HEALTHCHECK_PRELOAD', False):
+            from moj_irat.healthchecks import registry
+
+            # moves the cost of importing healthchecks from the first request to start-up
+            registry.ensure_loaded()
+        if getattr(settings, 'HEALTHCHECK_SCHEDULER', False) and \
+                getattr(settings, 'HEALTHCHECK_SCHEDULER_START_ON_READY', False):
+            from moj_irat.healthchecks import registry
+
+            registry.scheduler.start()
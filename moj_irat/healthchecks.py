@@ -1,16 +1,43 @@
+import asyncio
+import atexit
+import codecs
+import copy
+from concurrent.futures import (
+    FIRST_COMPLETED, CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError,
+    wait as wait_for_futures,
+)
+import datetime
+import http.cookiejar
 import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
 
 from django.conf import settings
 from django.utils.module_loading import autodiscover_modules, import_string
 
+from moj_irat.history import HealthcheckHistory
+from moj_irat.jsonpath import JsonPathAssertions
+from moj_irat.metrics import HealthcheckMetrics
+
 DEFAULT_HEALTHCHECKS = ['moj_irat.healthchecks.database_healthcheck']
+DEFAULT_HEALTHCHECK_TAGS = ('readiness',)
+DEFAULT_HEALTHCHECK_TIERS = ('liveness', 'readiness')
+
+logger = logging.getLogger(__name__)
 
 
 class HealthcheckResponse:
+    __slots__ = ('name', 'status', 'kwargs', 'duration_ms')
+
     def __init__(self, name, status, **kwargs):
         self.name = name
         self.status = status
         self.kwargs = kwargs
+        self.duration_ms = None
 
     def __str__(self, *args, **kwargs):
         return '%s: %s' % (self.name, 'Passed' if self.status else 'Failed')
@@ -22,8 +49,91 @@ class HealthcheckResponse:
         }
         if self.kwargs:
             data.update(self.kwargs)
+        if self.duration_ms is not None:
+            data['duration_ms'] = self.duration_ms
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Recreates a response from the output of `get_dict`
+        """
+        data = dict(data)
+        duration_ms = data.pop('duration_ms', None)
+        name, status = data.pop('name'), data.pop('status')
+        if 'responses' in data:
+            responses = [HealthcheckResponse.from_dict(member) for member in data.pop('responses')]
+            response = HealthcheckResponseGroup(name, responses, **data)
+        else:
+            response = cls(name, status, **data)
+        response.duration_ms = duration_ms
+        return response
+
+    def copy(self, **kwargs):
+        """
+        Returns a copy of the response with additional keyword arguments
+        """
+        response = HealthcheckResponse(self.name, self.status, **dict(self.kwargs, **kwargs))
+        response.duration_ms = self.duration_ms
+        return response
+
+    def get_result(self):
+        """
+        Returns the same as `get_dict` but without the name, which healthcheck.json uses as the key
+        """
+        result = {'status': self.status}
+        if self.kwargs:
+            result.update(self.kwargs)
+        if self.duration_ms is not None:
+            result['duration_ms'] = self.duration_ms
+        return result
+
+    def set_duration(self, duration):
+        """
+        Records how long the healthcheck took to run in seconds
+        """
+        self.duration_ms = round(duration * 1000, 3)
+
+
+class HealthcheckResponseGroup(HealthcheckResponse):
+    """
+    Responses of a healthcheck that checks several things, such as
+    `UrlHealthcheckGroup`, which are reported separately. It passes if
+    they all pass.
+    """
+    __slots__ = ('responses',)
+
+    def __init__(self, name, responses, **kwargs):
+        super().__init__(name, all(response.status for response in responses), **kwargs)
+        self.responses = responses
+
+    def get_dict(self):
+        data = super().get_dict()
+        data['responses'] = [response.get_dict() for response in self.responses]
         return data
 
+    def copy(self, **kwargs):
+        response = HealthcheckResponseGroup(
+            self.name,
+            [member.copy(**kwargs) for member in self.responses],
+            **dict(self.kwargs, **kwargs)
+        )
+        response.duration_ms = self.duration_ms
+        return response
+
+
+def flatten_responses(responses):
+    """
+    Replaces groups of responses with the responses they contain
+    """
+    flattened = []
+    for response in responses:
+        if isinstance(response, HealthcheckResponseGroup):
+            flattened.extend(response.responses)
+        else:
+            flattened.append(response)
+    return flattened
+
 
 def database_healthcheck():
     """
@@ -38,25 +148,490 @@ def database_healthcheck():
 database_healthcheck.name = 'database'
 
 
+class DatabaseHealthcheck:
+    """
+    Healthcheck running `SELECT 1` on Django databases in parallel, reporting
+    the latency of each. Every database is queried from its own long-lived
+    thread so that persistent connections (`CONN_MAX_AGE`) are reused between
+    probes rather than opened for each one.
+    """
+
+    def __init__(self, name='database', aliases=None, statement_timeout=None):
+        """
+        :param name: the name of this check
+        :param aliases: database aliases to check, defaults to all of settings.DATABASES
+        :param statement_timeout: seconds to wait for each database, defaults
+            to settings.HEALTHCHECK_DATABASE_STATEMENT_TIMEOUT (5 seconds)
+        """
+        self.name = name
+        self.aliases = aliases
+        self.statement_timeout = statement_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executors = {}
+        self._probes = {}
+
+    def __call__(self):
+        timeout = self.get_statement_timeout()
+        probes = {alias: self.submit_probe(alias, timeout) for alias in self.get_aliases()}
+        wait_for_futures(probes.values(), timeout=timeout)
+        databases = {alias: self.get_probe_result(probe) for alias, probe in probes.items()}
+        return HealthcheckResponse(
+            name=self.name,
+            status=all(result['status'] for result in databases.values()),
+            databases=databases,
+        )
+
+    def get_aliases(self):
+        if self.aliases is not None:
+            return list(self.aliases)
+        from django.db import connections
+
+        return list(connections)
+
+    def get_statement_timeout(self):
+        if self.statement_timeout is not None:
+            return self.statement_timeout
+        return getattr(settings, 'HEALTHCHECK_DATABASE_STATEMENT_TIMEOUT', 5)
+
+    def submit_probe(self, alias, timeout):
+        """
+        Queries a database on its thread, unless a previous probe that
+        has not finished yet can be waited for instead
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # threads do not survive forking
+                self._pid = os.getpid()
+                self._executors = {}
+                self._probes = {}
+            probe = self._probes.get(alias)
+            if probe is None or probe.done():
+                executor = self._executors.get(alias)
+                if executor is None:
+                    executor = self._executors[alias] = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix='healthcheck-database-%s' % alias,
+                    )
+                probe = self._probes[alias] = executor.submit(self.query_database, alias, timeout)
+            return probe
+
+    @classmethod
+    def get_probe_result(cls, probe):
+        if not probe.done():
+            return {'status': False, 'error': 'Timed out'}
+        try:
+            duration = probe.result()
+        except Exception as e:
+            return {'status': False, 'error': str(e)}
+        return {'status': True, 'duration_ms': round(duration * 1000, 3)}
+
+    @classmethod
+    def get_query(cls, vendor, timeout):
+        """
+        Returns a minimal query limited to `timeout` seconds where the
+        database supports it without changing the connection's session
+        """
+        timeout_ms = int(timeout * 1000)
+        if vendor == 'postgresql':
+            # one round trip; SET LOCAL does not outlast the transaction, which matters behind PgBouncer
+            return 'BEGIN; SET LOCAL statement_timeout = %d; SELECT 1; COMMIT' % timeout_ms
+        if vendor == 'mysql':
+            return 'SELECT /*+ MAX_EXECUTION_TIME(%d) */ 1' % timeout_ms
+        if vendor == 'oracle':
+            return 'SELECT 1 FROM DUAL'
+        return 'SELECT 1'
+
+    @classmethod
+    def query_database(cls, alias, timeout):
+        """
+        Runs the query on this thread's connection, returning how long it took
+        """
+        from django.db import connections
+
+        connection = connections[alias]
+        # as at the start and end of a request, closes connections that are broken or older than CONN_MAX_AGE
+        connection.close_if_unusable_or_obsolete()
+        started = time.monotonic()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(cls.get_query(connection.vendor, timeout))
+            return time.monotonic() - started
+        finally:
+            connection.close_if_unusable_or_obsolete()
+
+    @classmethod
+    def close_connection(cls, alias):
+        from django.db import connections
+
+        if alias in connections:
+            connections[alias].close()
+
+    def teardown(self):
+        """
+        Closes database connections and stops threads
+        """
+        with self._lock:
+            executors, self._executors = self._executors, {}
+            self._probes = {}
+        for alias, executor in executors.items():
+            executor.submit(self.close_connection, alias)
+            executor.shutdown(wait=False)
+
+
+class CacheHealthcheck:
+    """
+    Healthcheck writing and reading back a short-lived key in Django caches,
+    reporting the latency of each. It takes two round trips per cache, one
+    `set_many` and one `get_many`; the key expires on its own rather than
+    being deleted.
+    """
+
+    def __init__(self, name='cache', aliases=None, key_ttl=10):
+        """
+        :param name: the name of this check
+        :param aliases: cache aliases to check, defaults to all of settings.CACHES
+        :param key_ttl: seconds before the key written by the check expires
+        """
+        self.name = name
+        self.aliases = aliases
+        self.key_ttl = key_ttl
+        self.key = 'moj_irat.healthcheck.%s' % random.getrandbits(64)
+
+    def __call__(self):
+        cache_results = {alias: self.check_cache(alias) for alias in self.get_aliases()}
+        return HealthcheckResponse(
+            name=self.name,
+            status=all(result['status'] for result in cache_results.values()),
+            caches=cache_results,
+        )
+
+    def get_aliases(self):
+        if self.aliases is not None:
+            return list(self.aliases)
+        return list(settings.CACHES)
+
+    def check_cache(self, alias):
+        from django.core.cache import caches
+
+        value = '%s.%s' % (os.getpid(), time.time())
+        started = time.monotonic()
+        try:
+            cache = caches[alias]
+            cache.set_many({self.key: value}, timeout=self.key_ttl)
+            read_value = cache.get_many([self.key]).get(self.key)
+        except Exception as e:
+            return {'status': False, 'error': str(e)}
+        duration_ms = round((time.monotonic() - started) * 1000, 3)
+        if read_value != value:
+            return {'status': False, 'error': 'Value could not be read back', 'duration_ms': duration_ms}
+        return {'status': True, 'duration_ms': duration_ms}
+
+
+def make_import_error_healthcheck(path, error):
+    def healthcheck():
+        raise error
+
+    healthcheck.name = path
+    return healthcheck
+
+
+def get_healthcheck_name(healthcheck):
+    if hasattr(healthcheck, 'name'):
+        return healthcheck.name
+    return healthcheck.__name__
+
+
+def get_number_attribute(healthcheck, name):
+    """
+    Returns a numeric option set as an attribute of a healthcheck, or None if it
+    is not set or is not a number, e.g. because the healthcheck is a mock
+    """
+    value = getattr(healthcheck, name, None)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def is_async_healthcheck(healthcheck):
+    """
+    Whether a healthcheck is a coroutine function or a class or instance with an async `__call__`
+    """
+    if inspect.iscoroutinefunction(healthcheck):
+        return True
+    call = getattr(healthcheck, '__call__', None)  # noqa: B004
+    return inspect.iscoroutinefunction(call)
+
+
+def await_synchronously(awaitable):
+    """
+    Waits for an awaitable returned by an async healthcheck outside of an event loop
+    """
+    from asgiref.sync import async_to_sync
+
+    async def wait():
+        return await awaitable
+
+    return async_to_sync(wait)()
+
+
+def call_healthcheck(healthcheck):
+    """
+    Calls a healthcheck, waiting for the result if it is a coroutine
+    """
+    response = healthcheck()
+    if inspect.isawaitable(response):
+        response = await_synchronously(response)
+    return response
+
+
+def call_healthcheck_into_future(healthcheck, future):
+    from django.db import connections
+
+    try:
+        future.set_result(call_healthcheck(healthcheck))
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        # the thread is about to end so its database connections would otherwise be left open
+        connections.close_all()
+
+
+class Timeout(Exception):
+    """
+    Raised when a healthcheck does not finish within its timeout
+    """
+
+
+def healthcheck_timeout(seconds):
+    """
+    Decorator setting the number of seconds after which a healthcheck is abandoned and reported as failed
+    """
+
+    def decorator(healthcheck):
+        healthcheck.timeout = seconds
+        return healthcheck
+
+    return decorator
+
+
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+
+
+def get_http_session():
+    """
+    Returns the requests session shared by URL healthchecks in this process so
+    that connections to each host are pooled and kept alive between probes.
+    The pool can be configured using settings.HEALTHCHECK_HTTP_POOL_CONNECTIONS
+    (number of hosts), settings.HEALTHCHECK_HTTP_POOL_SIZE (connections per host),
+    settings.HEALTHCHECK_HTTP_RETRIES (count or urllib3 `Retry`)
+    and settings.HEALTHCHECK_HTTP_KEEP_ALIVE.
+    """
+    pid = os.getpid()
+    session = _http_sessions.get(pid)
+    if session is None:
+        with _http_sessions_lock:
+            session = _http_sessions.get(pid)
+            if session is None:
+                # sessions are not shared with forked processes
+                _http_sessions.clear()
+                session = _http_sessions[pid] = make_http_session()
+    return session
+
+
+def make_http_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    # cookies set by one dependency must not affect later probes
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'HEALTHCHECK_HTTP_POOL_CONNECTIONS', 10),
+        pool_maxsize=getattr(settings, 'HEALTHCHECK_HTTP_POOL_SIZE', 10),
+        max_retries=getattr(settings, 'HEALTHCHECK_HTTP_RETRIES', 0),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not getattr(settings, 'HEALTHCHECK_HTTP_KEEP_ALIVE', True):
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def reset_http_sessions():
+    """
+    Closes shared sessions so that they are recreated using current settings
+    """
+    with _http_sessions_lock:
+        for session in _http_sessions.values():
+            session.close()
+        _http_sessions.clear()
+
+
 def get_key_path(data, path):
-    if not path:
-        return data
-    if isinstance(data, list):
-        next_data = data[int(path[0])]
-    else:
-        next_data = data[path[0]]
-    return get_key_path(next_data, path[1:])
+    """
+    Returns the value at a path of keys and list indices, raising KeyError or IndexError if missing.
+    UrlHealthcheck uses compiled `moj_irat.jsonpath.JsonPathAssertions` instead.
+    """
+    for key in path:
+        if isinstance(data, list):
+            data = data[int(key)]
+        else:
+            data = data[key]
+    return data
+
+
+class CachedHealthcheckResponse:
+    """
+    A healthcheck response held in the registry's result cache
+    """
+
+    def __init__(self, response, cached_at=None):
+        self.response = response
+        self.cached_at = time.time()
+        self.cached_at_monotonic = time.monotonic()
+        if cached_at is not None:
+            # made by another process, so only wall clock times can be compared
+            self.cached_at_monotonic -= self.cached_at - cached_at
+            self.cached_at = cached_at
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(HealthcheckResponse.from_dict(record['response']), cached_at=record['cached_at'])
+
+    def get_record(self):
+        """
+        Returns the response and when it was made for saving in a `moj_irat.stores.ResultStore`
+        """
+        return {'response': self.response.get_dict(), 'cached_at': self.cached_at}
+
+    @property
+    def age(self):
+        return time.monotonic() - self.cached_at_monotonic
+
+    def get_response(self):
+        """
+        Returns a copy of the cached response annotated with when it was made
+        """
+        cached_at = datetime.datetime.fromtimestamp(self.cached_at, tz=datetime.timezone.utc)
+        return self.response.copy(cached_at=cached_at.isoformat(), age=round(self.age, 3))
+
+
+class HealthcheckRun:
+    """
+    A run of healthchecks in progress that other callers can wait on
+    """
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.finished = threading.Event()
+        self.responses = None
+        self.exception = None
+
+    def wait(self):
+        self.finished.wait()
+        if self.exception is not None:
+            raise self.exception
+        return list(self.responses)
+
+
+class CircuitBreaker:
+    """
+    Stops running a healthcheck for a cooldown period after a number of
+    consecutive failures. After the cooldown, one trial run is allowed
+    (half-open): if it passes the circuit closes, otherwise it opens again.
+    """
+    closed = 'closed'
+    open = 'open'
+    half_open = 'half-open'
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.closed
+        self.failures = 0
+        self.opened_at = None
+        self.last_attempt = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Whether the healthcheck should be run
+        """
+        with self._lock:
+            if self.state == self.closed:
+                return True
+            if self.state == self.open and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.half_open
+                return True
+            return False
+
+    def record(self, status):
+        """
+        Records the result of running the healthcheck
+        """
+        with self._lock:
+            self.last_attempt = time.time()
+            if status:
+                self.failures = 0
+                self.state = self.closed
+                return
+            self.failures += 1
+            if self.state == self.half_open or self.failures >= self.threshold:
+                self.state = self.open
+                self.opened_at = time.monotonic()
+
+    def get_last_attempt(self):
+        if self.last_attempt is None:
+            return None
+        return datetime.datetime.fromtimestamp(self.last_attempt, tz=datetime.timezone.utc).isoformat()
+
+
+class TokenBucket:
+    """
+    Allows `rate` runs per second on average with bursts of up to `burst` runs.
+    The lock is only held to update two numbers, so it is cheap to share
+    between many threads.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self):
+        """
+        Takes a token if one is available, returning whether the run is allowed
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class ResponseTooLarge(Exception):
+    pass
 
 
 class UrlHealthcheck:
     """
     Healthcheck for loading a URL
     """
+    chunk_size = 8192
+    # `timeout` is passed to requests, so it is not also run on a thread of its own
+    enforces_timeout = True
 
     def __init__(self, name, url, method='get',
                  data=None, headers=None, auth=None,
                  status_code=200, timeout=5, allow_redirects=False,
-                 text_in_response=None, value_at_json_path=None):
+                 text_in_response=None, value_at_json_path=None,
+                 session=None, max_response_size=None):
         """
         :param name: the name of this check
         :param url: url to request
@@ -69,8 +644,13 @@ class UrlHealthcheck:
         :param allow_redirects: whether redirects should be followed
         :param text_in_response: expected text in response
         :param value_at_json_path: expected value at path in json response,
-            tuple of (value, dotted path)
-        :type value_at_json_path: tuple
+            tuple of (value, dotted path) or (value, dotted path, operator)
+            or a list of these; see `moj_irat.jsonpath`
+        :type value_at_json_path: tuple or list
+        :param session: optional requests session, defaults to one shared
+            by all URL healthchecks in the process
+        :param max_response_size: max bytes of the response body to read,
+            defaults to settings.HEALTHCHECK_MAX_RESPONSE_SIZE (1MiB)
         """
         self.name = name
         self.url = url
@@ -83,41 +663,146 @@ class UrlHealthcheck:
         self.allow_redirects = allow_redirects
         self.text_in_response = text_in_response
         self.value_at_json_path = value_at_json_path
+        self.json_path_assertions = JsonPathAssertions.from_setting(value_at_json_path)
+        self.session = session
+        self.max_response_size = max_response_size
+        # body read during the current call on each thread
+        self._local = threading.local()
+
+    def __copy__(self):
+        healthcheck = self.__class__.__new__(self.__class__)
+        healthcheck.__dict__.update(self.__dict__)
+        healthcheck._local = threading.local()
+        return healthcheck
+
+    @property
+    def needs_content(self):
+        """
+        Whether the whole response body needs to be read
+        """
+        return self.json_path_assertions is not None
+
+    def get_max_response_size(self):
+        if self.max_response_size is not None:
+            return self.max_response_size
+        return getattr(settings, 'HEALTHCHECK_MAX_RESPONSE_SIZE', 1024 * 1024)
 
     def __call__(self):
         import requests
 
+        self._local.content = None
+        self._local.consumed = False
         try:
-            method = getattr(requests, self.method)
+            method = getattr(self.session or get_http_session(), self.method)
             url_response = method(self.url, data=self.data,
                                   headers=self.headers, auth=self.auth,
                                   timeout=self.timeout,
-                                  allow_redirects=self.allow_redirects)
-            if self.status_code is not None and \
-                    url_response.status_code != self.status_code:
-                return self.error_response('Response status was not %s' %
-                                           self.status_code)
-            if self.text_in_response is not None and \
-                    self.text_in_response not in url_response.text:
-                return self.error_response('Response text did not contain %s' %
-                                           self.text_in_response)
-            if self.value_at_json_path is not None:
-                expected_value = self.value_at_json_path[0]
-                json_path = self.value_at_json_path[1]
-                try:
-                    value = get_key_path(url_response.json(), json_path.split('.'))
-                except (KeyError, IndexError, ValueError):
-                    return self.error_response('Response JSON path "%s" does not exist' %
-                                               json_path)
-                if value != expected_value:
-                    return self.error_response('Response JSON path "%s" did not contain "%s"' %
-                                               (json_path, expected_value))
+                                  allow_redirects=self.allow_redirects,
+                                  stream=True)
+            try:
+                error = self.check_response(url_response)
+                if error:
+                    return self.error_response(error)
+                return self.success_response(url_response)
+            finally:
+                self.release_response(url_response)
+                self._local.content = None
         except requests.Timeout:
             return self.error_response('Timed out')
         except requests.HTTPError:
             return self.error_response('URL not loaded')
+        except ResponseTooLarge:
+            return self.error_response('Response was larger than %s bytes' % self.get_max_response_size())
+
+    def check_response(self, url_response):
+        """
+        Returns an error message if the response is not as expected
+        """
+        if self.status_code is not None and \
+                url_response.status_code != self.status_code:
+            return 'Response status was not %s' % self.status_code
+        if self.text_in_response is not None and \
+                not self.response_contains_text(url_response, self.text_in_response):
+            return 'Response text did not contain %s' % self.text_in_response
+        if self.json_path_assertions is not None:
+            try:
+                document = json.loads(self.read_content(url_response))
+            except ValueError:
+                return 'Response JSON path "%s" does not exist' % self.json_path_assertions.assertions[0].path
+            return self.json_path_assertions.check(document)
+
+    def read_content(self, url_response):
+        """
+        Reads the streamed response body, which is kept until the call finishes.
+        Raises ResponseTooLarge without reading further if the body is larger
+        than the maximum response size.
+        """
+        if self._local.content is not None:
+            return self._local.content
+        max_size = self.get_max_response_size()
+        content_length = url_response.headers.get('Content-Length', '')
+        if max_size and content_length.isdigit() and int(content_length) > max_size:
+            raise ResponseTooLarge
+        chunks = []
+        size = 0
+        for chunk in self.iter_content(url_response):
+            size += len(chunk)
+            if max_size and size > max_size:
+                raise ResponseTooLarge
+            chunks.append(chunk)
+        self._local.content = b''.join(chunks)
+        return self._local.content
+
+    def iter_content(self, url_response):
+        for chunk in url_response.iter_content(self.chunk_size):
+            yield chunk
+        self._local.consumed = True
+
+    def response_contains_text(self, url_response, text):
+        """
+        Searches the decoded response body for text chunk by chunk, stopping as soon as it is found
+        """
+        decoder = self.get_text_decoder(url_response)
+        if self.needs_content:
+            return text in decoder.decode(self.read_content(url_response), final=True)
+        max_size = self.get_max_response_size()
+        size = 0
+        tail = ''
+        for chunk in self.iter_content(url_response):
+            size += len(chunk)
+            chunk = tail + decoder.decode(chunk)
+            if text in chunk:
+                return True
+            if max_size and size > max_size:
+                raise ResponseTooLarge
+            # keep enough of the end to find text split across chunks
+            tail = chunk[max(0, len(chunk) - len(text) + 1):] if len(text) > 1 else ''
+        return text in tail + decoder.decode(b'', final=True)
 
-        return self.success_response(url_response)
+    @classmethod
+    def get_text_decoder(cls, url_response):
+        """
+        Returns an incremental decoder for the response body, which does not split
+        characters across chunks; undecodable bytes and unknown encodings are
+        handled as `requests` does for `Response.text`
+        """
+        try:
+            decoder = codecs.getincrementaldecoder(url_response.encoding or 'utf-8')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')
+        return decoder(errors='replace')
+
+    def release_response(self, url_response):
+        """
+        Closes the response without downloading any large unread part of the
+        body; small bodies are read so that the connection can be reused
+        """
+        if not self._local.consumed:
+            content_length = url_response.headers.get('Content-Length', '')
+            if content_length.isdigit() and int(content_length) <= self.chunk_size:
+                for _ in self.iter_content(url_response):
+                    pass
+        url_response.close()
 
     def error_response(self, error):
         return HealthcheckResponse(self.name, False, error=error,
@@ -132,29 +817,357 @@ class JsonUrlHealthcheck(UrlHealthcheck):
     Healthcheck for loading a JSON URL and including it in the response
     """
 
+    def __init__(self, *args, max_embedded_size=None, **kwargs):
+        """
+        :param max_embedded_size: max bytes of JSON response to include,
+            defaults to settings.HEALTHCHECK_MAX_EMBEDDED_RESPONSE_SIZE (64KiB)
+        """
+        super(JsonUrlHealthcheck, self).__init__(*args, **kwargs)
+        self.max_embedded_size = max_embedded_size
+
+    @property
+    def needs_content(self):
+        return True
+
+    def get_max_embedded_size(self):
+        if self.max_embedded_size is not None:
+            return self.max_embedded_size
+        return getattr(settings, 'HEALTHCHECK_MAX_EMBEDDED_RESPONSE_SIZE', 64 * 1024)
+
     def success_response(self, url_response):
         response = super(JsonUrlHealthcheck, self).success_response(url_response)
+        content = self.read_content(url_response)
+        max_embedded_size = self.get_max_embedded_size()
+        if max_embedded_size and len(content) > max_embedded_size:
+            response.kwargs['response'] = 'JSON response too large to include (%s bytes)' % len(content)
+            return response
         try:
-            response.kwargs['response'] = url_response.json()
+            response.kwargs['response'] = json.loads(content)
         except ValueError:
             response.kwargs['response'] = 'JSON response cannot be parsed'
         return response
 
 
+class UrlHealthcheckGroup:
+    """
+    Healthcheck loading several URLs concurrently within one deadline, which
+    returns a response for each URL. Connections are pooled per host by the
+    session shared by URL healthchecks, so URLs on the same few hosts reuse
+    a small number of connections.
+    """
+
+    def __init__(self, name, urls, deadline=10, max_workers=None, session=None):
+        """
+        :param name: the name of this group of checks
+        :param urls: dicts of `UrlHealthcheck` arguments, or URL healthchecks
+        :param deadline: max time in seconds to try loading all URLs, which also
+            limits the timeout of each
+        :param max_workers: number of URLs to load at the same time, defaults to
+            settings.HEALTHCHECK_HTTP_POOL_SIZE so that each can use a pooled connection
+        :param session: optional requests session for URLs that do not set their own
+        """
+        self.name = name
+        self.deadline = deadline
+        self.session = session
+        self.healthchecks = [self.make_healthcheck(url) for url in urls]
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+
+    def make_healthcheck(self, url):
+        if isinstance(url, dict):
+            url = dict(url)
+            url.setdefault('session', self.session)
+            url = UrlHealthcheck(**url)
+        else:
+            # the deadline must not change the timeout of the caller's instance
+            url = copy.copy(url)
+        if self.deadline is not None and (url.timeout is None or url.timeout > self.deadline):
+            url.timeout = self.deadline
+        return url
+
+    def get_executor(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # threads do not survive forking
+                self._pid = os.getpid()
+                max_workers = self.max_workers or getattr(settings, 'HEALTHCHECK_HTTP_POOL_SIZE', 10)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, min(max_workers, len(self.healthchecks))),
+                    thread_name_prefix='healthcheck-%s' % self.name,
+                )
+            return self._executor
+
+    def __call__(self):
+        executor = self.get_executor()
+        futures = [executor.submit(self.run_url_healthcheck, healthcheck) for healthcheck in self.healthchecks]
+        wait_for_futures(futures, timeout=self.deadline)
+        return [
+            self.get_response(healthcheck, future)
+            for healthcheck, future in zip(self.healthchecks, futures)
+        ]
+
+    @classmethod
+    def run_url_healthcheck(cls, healthcheck):
+        started = time.monotonic()
+        try:
+            response = HealthcheckRegistry.make_response(healthcheck, healthcheck())
+        except Exception as e:
+            response = HealthcheckRegistry.exception_response(healthcheck, e)
+        response.set_duration(time.monotonic() - started)
+        return response
+
+    def get_response(self, healthcheck, future):
+        if future.done():
+            return future.result()
+        future.cancel()
+        response = HealthcheckResponse(
+            name=get_healthcheck_name(healthcheck),
+            status=False,
+            error='Timed out',
+            timed_out=True,
+        )
+        response.set_duration(self.deadline)
+        return response
+
+    def teardown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._pid = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+class HealthcheckScheduler:
+    """
+    Runs registered healthchecks in a background daemon thread so that
+    requests can be served from the latest results without probing
+    dependencies. Each healthcheck runs every `interval` seconds (taken from
+    its attribute or settings.HEALTHCHECK_SCHEDULER_INTERVAL) with some
+    random jitter; results older than settings.HEALTHCHECK_MAX_AGE (three
+    intervals by default) are reported as failed.
+
+    The thread is started on first use in each process so that forked
+    workers run their own scheduler.
+    """
+    default_interval = 30
+    default_jitter = 0.1
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop_event = threading.Event()
+        self._results = {}
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'HEALTHCHECK_SCHEDULER', False)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def start(self):
+        """
+        Starts the scheduler thread in this process if it is not already running
+        """
+        with self._lock:
+            if self.running:
+                return
+            self._stop_event = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self.run, args=(self._stop_event,),
+                                            name='healthcheck-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """
+        Stops the scheduler thread, waiting for a run in progress to finish
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stop_event.set()
+        if thread is not None and thread is not threading.current_thread() and self._pid == os.getpid():
+            thread.join(timeout)
+        self._results = {}
+
+    def _after_fork(self):
+        # threads do not survive forking so the child starts its own on first use
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._results = {}
+
+    @classmethod
+    def get_interval(cls, healthcheck):
+        interval = get_number_attribute(healthcheck, 'interval')
+        if interval is None:
+            interval = getattr(settings, 'HEALTHCHECK_SCHEDULER_INTERVAL', cls.default_interval)
+        return interval
+
+    def get_next_run_delay(self, healthcheck):
+        jitter = getattr(settings, 'HEALTHCHECK_SCHEDULER_JITTER', self.default_jitter)
+        return self.get_interval(healthcheck) * (1 + random.uniform(-jitter, jitter))
+
+    def get_max_age(self, healthcheck):
+        max_age = getattr(settings, 'HEALTHCHECK_MAX_AGE', None)
+        if max_age is None:
+            max_age = 3 * self.get_interval(healthcheck)
+        return max_age
+
+    def run(self, stop_event):
+        next_runs = {}
+        while not stop_event.is_set():
+            try:
+                delay = self.run_due_healthchecks(next_runs)
+            except Exception:
+                logger.exception('Healthcheck scheduler failed')
+                delay = self.default_interval
+            stop_event.wait(delay)
+
+    def run_due_healthchecks(self, next_runs):
+        """
+        Runs healthchecks whose next run time has passed, updating `next_runs`
+        and returning the number of seconds until the next one is due
+        """
+        healthchecks = self.registry.get_healthchecks()
+        now = time.monotonic()
+        due = [
+            healthcheck
+            for healthcheck in healthchecks
+            if next_runs.get(get_healthcheck_name(healthcheck), now) <= now
+        ]
+        if due:
+            responses = self.registry.run_selected_healthchecks(due)
+            for healthcheck, response in zip(due, responses):
+                name = get_healthcheck_name(healthcheck)
+                self._results[name] = CachedHealthcheckResponse(response)
+                next_runs[name] = time.monotonic() + self.get_next_run_delay(healthcheck)
+        if not next_runs:
+            return self.default_interval
+        return max(0, min(next_runs.values()) - time.monotonic())
+
+    def get_responses(self, tier=None):
+        """
+        Returns the latest response of each registered healthcheck
+        """
+        self.start()
+        return [self.get_response(healthcheck) for healthcheck in self.registry.get_healthchecks(tier)]
+
+    def get_response(self, healthcheck):
+        name = get_healthcheck_name(healthcheck)
+        cached = self._results.get(name)
+        if cached is None:
+            return HealthcheckResponse(name, False, error='Not checked yet')
+        response = cached.get_response()
+        if cached.age > self.get_max_age(healthcheck):
+            response.status = False
+            response.kwargs.update(error='Result is too old', stale=True)
+        return response
+
+
 class HealthcheckRegistry:
     """
     Healthcheck registry - loads and runs healthchecks.  A healthcheck is a
     callable, or a class whose instances are callable, that returns a bool,
     a HealthcheckResponse or raises an exception.
+
+    Classes are instantiated once, when healthchecks are loaded, and reused for
+    every run so that they can hold long-lived resources such as pooled clients.
+    Their optional `setup()` method is called after instantiation and `teardown()`
+    when the registry is reset. Classes with `instantiate_per_run = True` are
+    instead instantiated for each run.
     """
 
+    # threads for synchronous healthchecks run by `arun_healthchecks`, as many as asyncio uses by default
+    default_async_workers = min(32, (os.cpu_count() or 1) + 4)
+
     def __init__(self):
         self._registry = []
+        self._registry_options = {}
         self._registry_loaded = False
+        self._instances_lock = threading.Lock()
+        self._instances = {}
+        self._resolve_lock = threading.Lock()
+        self._resolved = {}
+        self._executors = {}
+        self._pooled_runs_lock = threading.Lock()
+        self._pooled_runs = {}
+        self._cache_lock = threading.Lock()
+        self._cache = {}
+        self._refreshing = set()
+        self._runs_lock = threading.Lock()
+        self._runs = {}
+        self._async_runs = {}
+        self._circuit_breakers_lock = threading.Lock()
+        self._circuit_breakers = {}
+        self._rate_limiters_lock = threading.Lock()
+        self._rate_limiters = {}
+        self._last_responses = {}
+        self._result_store = None
+        self._timed_calls_lock = threading.Lock()
+        self._timed_calls = {}
+        self._load_lock = threading.Lock()
+        self._executor_lock = threading.Lock()
+        self.scheduler = HealthcheckScheduler(self)
+        self.metrics = HealthcheckMetrics()
+        self.history = HealthcheckHistory()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
 
     def reset(self):
+        self.scheduler.stop()
+        self.teardown_healthchecks()
         self._registry = []
+        self._registry_options = {}
         self._registry_loaded = False
+        with self._resolve_lock:
+            self._resolved = {}
+        with self._executor_lock:
+            for executor in self._executors.values():
+                executor.shutdown(wait=False)
+            self._executors = {}
+        with self._pooled_runs_lock:
+            self._pooled_runs = {}
+        with self._cache_lock:
+            self._cache = {}
+            self._refreshing = set()
+        with self._circuit_breakers_lock:
+            self._circuit_breakers = {}
+        with self._rate_limiters_lock:
+            self._rate_limiters = {}
+            self._last_responses = {}
+        self._result_store = None
+        with self._timed_calls_lock:
+            self._timed_calls = {}
+        self.metrics.reset()
+        self.history.reset()
+
+    def _after_fork(self):
+        # threads do not survive forking, so the child starts its own pools and
+        # forgets runs that were in progress in the parent
+        self._resolve_lock = threading.Lock()
+        self._instances_lock = threading.Lock()
+        self._executor_lock = threading.Lock()
+        self._executors = {}
+        self._pooled_runs_lock = threading.Lock()
+        self._pooled_runs = {}
+        self._cache_lock = threading.Lock()
+        self._refreshing = set()
+        self._runs_lock = threading.Lock()
+        self._runs = {}
+        self._async_runs = {}
+        self._circuit_breakers_lock = threading.Lock()
+        self._rate_limiters_lock = threading.Lock()
+        self._timed_calls_lock = threading.Lock()
+        self._timed_calls = {}
+        self._load_lock = threading.Lock()
 
     def load_healthchecks(self):
         """
@@ -163,16 +1176,81 @@ class HealthcheckRegistry:
         self.load_default_healthchecks()
         if getattr(settings, 'AUTODISCOVER_HEALTHCHECKS', True):
             self.autodiscover_healthchecks()
+        self.setup_healthchecks()
+        self.check_dependencies()
         self._registry_loaded = True
 
+    def check_dependencies(self):
+        """
+        Logs healthchecks with circular dependencies, which are reported as
+        failed whenever they are run. Healthchecks that are only imported when
+        first run are not checked.
+        """
+        healthchecks = [healthcheck for healthcheck in self._registry if not isinstance(healthcheck, str)]
+        _, _, circular = self.get_dependency_graph(healthchecks)
+        if circular:
+            names = sorted({get_healthcheck_name(healthchecks[index]) for index in circular})
+            logger.error('Healthchecks have circular dependencies: %s', ', '.join(names))
+
+    def setup_healthchecks(self):
+        """
+        Instantiates class-based healthchecks; failures are logged and
+        retried when the healthcheck is next run
+        """
+        for healthcheck in self._registry:
+            if inspect.isclass(healthcheck) and not getattr(healthcheck, 'instantiate_per_run', False):
+                try:
+                    self.get_healthcheck_instance(healthcheck)
+                except Exception:
+                    logger.exception('Cannot set up healthcheck %s', get_healthcheck_name(healthcheck))
+
+    def teardown_healthchecks(self):
+        """
+        Discards instances of class-based healthchecks, calling their `teardown()` method
+        """
+        with self._instances_lock:
+            instances, self._instances = self._instances, {}
+        for instance in instances.values():
+            teardown = getattr(instance, 'teardown', None)
+            if teardown is None:
+                continue
+            try:
+                teardown()
+            except Exception:
+                logger.exception('Cannot tear down healthcheck %s', get_healthcheck_name(instance))
+
+    def get_healthcheck_instance(self, healthcheck):
+        """
+        Returns the callable to run for a healthcheck, instantiating classes
+        and calling their `setup()` method the first time they are used
+        """
+        if not inspect.isclass(healthcheck):
+            return healthcheck
+        if getattr(healthcheck, 'instantiate_per_run', False):
+            return healthcheck()
+        instance = self._instances.get(id(healthcheck))
+        if instance is None:
+            with self._instances_lock:
+                instance = self._instances.get(id(healthcheck))
+                if instance is None:
+                    instance = healthcheck()
+                    setup = getattr(instance, 'setup', None)
+                    if setup is not None:
+                        setup()
+                    self._instances[id(healthcheck)] = instance
+        return instance
+
     def load_default_healthchecks(self):
         """
         Loads healthchecks specified in settings.HEALTHCHECKS as dotted import
         paths to the classes. Defaults are listed in `DEFAULT_HEALTHCHECKS`.
+        With settings.HEALTHCHECK_LAZY_IMPORT, each is only imported when first run.
         """
         default_healthchecks = getattr(settings, 'HEALTHCHECKS', DEFAULT_HEALTHCHECKS)
+        lazy_import = getattr(settings, 'HEALTHCHECK_LAZY_IMPORT', False)
         for healthcheck in default_healthchecks:
-            healthcheck = import_string(healthcheck)
+            if not lazy_import:
+                healthcheck = import_string(healthcheck)
             self.register_healthcheck(healthcheck)
 
     def autodiscover_healthchecks(self):
@@ -182,47 +1260,864 @@ class HealthcheckRegistry:
         """
         autodiscover_modules('healthchecks', register_to=self)
 
-    def register_healthcheck(self, healthcheck):
+    def register_healthcheck(self, healthcheck, tags=None, depends_on=None):
         """
         Register a healthcheck. Call this method from your apps'
         healthchecks.py and use autodiscovery for loading.
-        :param healthcheck: callable or callable class
+        :param healthcheck: callable or callable class, or the dotted import
+            path of one to import only when it is first run
+        :param tags: tiers that the healthcheck belongs to, e.g. `liveness` or `readiness`;
+            defaults to its `tags` attribute or `DEFAULT_HEALTHCHECK_TAGS`, which is also used
+            for a dotted path until it is imported
+        :param depends_on: names of healthchecks that must pass for this one to be run;
+            defaults to its `depends_on` attribute
         """
         self._registry.append(healthcheck)
+        if tags is not None:
+            self._registry_options.setdefault(id(healthcheck), {})['tags'] = tuple(tags)
+        if depends_on is not None:
+            self._registry_options.setdefault(id(healthcheck), {})['depends_on'] = tuple(depends_on)
 
-    def run_healthchecks(self):
+    def get_healthcheck_tags(self, healthcheck):
+        options = self._registry_options.get(id(healthcheck), {})
+        if 'tags' in options:
+            return options['tags']
+        if isinstance(healthcheck, str):
+            # not imported just to find its tags, which would defeat lazy imports when filtering by tier
+            healthcheck = self._resolved.get(healthcheck)
+            if healthcheck is None:
+                return DEFAULT_HEALTHCHECK_TAGS
+        return tuple(getattr(healthcheck, 'tags', DEFAULT_HEALTHCHECK_TAGS))
+
+    def get_healthcheck_dependencies(self, healthcheck):
+        options = self._registry_options.get(id(healthcheck), {})
+        if 'depends_on' in options:
+            return options['depends_on']
+        return tuple(getattr(healthcheck, 'depends_on', ()))
+
+    def get_dependency_graph(self, healthchecks):
         """
-        Runs all registered healthchecks and returns a list of
-        HealthcheckResponse.
+        Returns the indices of the healthchecks that each one depends on, an
+        order in which to run them so that dependencies come first and the
+        indices of those that cannot be run because their dependencies are
+        circular. Dependencies on healthchecks that are not being run are ignored.
         """
+        indices = {}
+        for index, healthcheck in enumerate(healthchecks):
+            indices.setdefault(get_healthcheck_name(healthcheck), []).append(index)
+        dependencies = [
+            {
+                dependency_index
+                for name in self.get_healthcheck_dependencies(healthcheck)
+                for dependency_index in indices.get(name, ())
+            }
+            for healthcheck in healthchecks
+        ]
+        order = []
+        remaining = dict(enumerate(dependencies))
+        while remaining:
+            ready = [
+                index
+                for index, index_dependencies in remaining.items()
+                if remaining.keys().isdisjoint(index_dependencies)
+            ]
+            if not ready:
+                break
+            for index in ready:
+                del remaining[index]
+            order.extend(ready)
+        return dependencies, order, sorted(remaining)
+
+    @classmethod
+    def dependency_failed_response(cls, healthcheck, dependency_response):
+        return HealthcheckResponse(
+            name=get_healthcheck_name(healthcheck),
+            status=False,
+            skipped='dependency_failed',
+            dependency=dependency_response.name,
+        )
+
+    @classmethod
+    def circular_dependency_response(cls, healthcheck):
+        return HealthcheckResponse(
+            name=get_healthcheck_name(healthcheck),
+            status=False,
+            skipped='circular_dependency',
+        )
+
+    def resolve_healthcheck(self, healthcheck):
+        """
+        Imports a healthcheck registered by dotted path. If it cannot be
+        imported, returns a healthcheck that fails with the import error
+        and tries again next time.
+        """
+        if not isinstance(healthcheck, str):
+            return healthcheck
+        resolved = self._resolved.get(healthcheck)
+        if resolved is not None:
+            return resolved
+        with self._resolve_lock:
+            resolved = self._resolved.get(healthcheck)
+            if resolved is None:
+                try:
+                    resolved = import_string(healthcheck)
+                except ImportError as e:
+                    logger.exception('Cannot import healthcheck %s', healthcheck)
+                    return make_import_error_healthcheck(healthcheck, e)
+                options = self._registry_options.get(id(healthcheck))
+                if options is not None:
+                    self._registry_options.setdefault(id(resolved), options)
+                self._resolved[healthcheck] = resolved
+        return resolved
+
+    def get_tiers(self):
+        """
+        Returns names of tiers that healthchecks can be selected by
+        """
+        tiers = set(DEFAULT_HEALTHCHECK_TIERS)
+        tiers.update(getattr(settings, 'HEALTHCHECK_TIERS', {}))
+        self.ensure_loaded()
+        for healthcheck in list(self._registry):
+            tiers.update(self.get_healthcheck_tags(healthcheck))
+        return tiers
+
+    @classmethod
+    def get_setting(cls, name, tier=None, default=None):
+        """
+        Returns a setting from settings.HEALTHCHECK_TIERS[tier] if present,
+        otherwise settings.HEALTHCHECK_<NAME>
+        """
+        if tier is not None:
+            tier_settings = getattr(settings, 'HEALTHCHECK_TIERS', {}).get(tier, {})
+            if name in tier_settings:
+                return tier_settings[name]
+        return getattr(settings, 'HEALTHCHECK_%s' % name.upper(), default)
+
+    def has_unresolved_healthchecks(self):
+        return any(
+            isinstance(healthcheck, str) and healthcheck not in self._resolved
+            for healthcheck in self._registry
+        )
+
+    def ensure_loaded(self):
         if not self._registry_loaded:
-            self.load_healthchecks()
+            with self._load_lock:
+                if not self._registry_loaded:
+                    self.load_healthchecks()
+
+    def get_healthchecks(self, tier=None):
+        """
+        Returns registered healthchecks, loading them first if necessary.
+        :param tier: only return healthchecks tagged with this tier
+        """
+        self.ensure_loaded()
+        return [
+            self.resolve_healthcheck(healthcheck)
+            for healthcheck in list(self._registry)
+            if tier is None or tier in self.get_healthcheck_tags(healthcheck)
+        ]
+
+    def run_healthchecks(self, tier=None):
+        """
+        Runs all registered healthchecks and returns a list of
+        HealthcheckResponse in registration order.
+
+        If a tier is given, only healthchecks tagged with it are run and its
+        options in settings.HEALTHCHECK_TIERS (`cache_ttl`, `deadline` and
+        `max_workers`) override the global settings.
+
+        Callers arriving while a run is already in progress wait for it to
+        finish and share its responses rather than starting another run.
+        When settings.HEALTHCHECK_SCHEDULER is enabled, the latest results
+        from the background scheduler are returned instead.
+
+        Healthchecks can return a list of responses, e.g. `UrlHealthcheckGroup`,
+        which are returned in its place.
+        """
+        if self.scheduler.enabled:
+            return flatten_responses(self.scheduler.get_responses(tier))
+        return flatten_responses(self.coalesce_run(tier or '*', lambda: self.run_registered_healthchecks(tier)))
+
+    def coalesce_run(self, key, run):
+        """
+        Calls `run` unless a run with the same key is already in progress
+        in another thread, in which case its result is waited for instead.
+        """
+        with self._runs_lock:
+            current_run = self._runs.get(key)
+            leading = current_run is None
+            if leading:
+                current_run = self._runs[key] = HealthcheckRun()
+        if not leading:
+            if current_run.thread is threading.current_thread():
+                # re-entrant call from within a healthcheck
+                return run()
+            return current_run.wait()
 
-        def get_healthcheck_name(hc):
-            if hasattr(hc, 'name'):
-                return hc.name
-            return hc.__name__
+        try:
+            current_run.responses = run()
+        except Exception as e:
+            current_run.exception = e
+            raise
+        finally:
+            with self._runs_lock:
+                del self._runs[key]
+            current_run.finished.set()
+        return list(current_run.responses)
+
+    def run_registered_healthchecks(self, tier=None):
+        """
+        Loads healthchecks if necessary and runs them.
+        """
+        return self.run_selected_healthchecks(self.get_healthchecks(tier), tier)
+
+    def run_selected_healthchecks(self, healthchecks, tier=None):
+        """
+        Runs the given healthchecks.
+
+        Healthchecks are run one after another unless
+        settings.HEALTHCHECK_MAX_WORKERS is greater than 1, in which case they
+        run concurrently on a shared thread pool. Healthchecks that depend on
+        others are only run once those have passed. settings.HEALTHCHECK_DEADLINE
+        optionally limits the total time in seconds spent on a run; healthchecks
+        that have not finished by then are reported as failed and `timed_out`.
+        """
+        max_workers = self.get_setting('max_workers', tier, 1)
+        deadline = self.get_setting('deadline', tier)
+        if any(self.get_healthcheck_dependencies(healthcheck) for healthcheck in healthchecks):
+            responses = self.run_healthchecks_in_dependency_order(healthchecks, max_workers, deadline, tier)
+        elif max_workers > 1:
+            responses = self.run_healthchecks_concurrently(healthchecks, max_workers, deadline, tier)
+        else:
+            responses = self.run_healthchecks_sequentially(healthchecks, deadline, tier)
+        self.save_metrics()
+        return responses
 
+    def run_healthchecks_sequentially(self, healthchecks, deadline=None, tier=None):
+        """
+        Runs healthchecks one after another. Those not yet started when the
+        deadline passes are not run and are reported as timed out.
+        """
+        started = time.monotonic()
         responses = []
-        for healthcheck in self._registry:
+        for healthcheck in healthchecks:
+            if deadline is not None and time.monotonic() - started >= deadline:
+                response = self.timed_out_response(healthcheck, 0)
+            else:
+                response = self.run_healthcheck(healthcheck, tier)
+            responses.append(response)
+        return responses
+
+    def run_healthchecks_concurrently(self, healthchecks, max_workers, deadline=None, tier=None):
+        """
+        Runs healthchecks on a thread pool, waiting for each at most until the
+        sooner of the global deadline and its own `timeout` attribute.
+        Healthchecks still running at that point are abandoned and reported as
+        timed out; the order of responses matches that of `healthchecks`.
+        """
+        executor = self.get_executor(max_workers)
+        started = time.monotonic()
+        futures = [self.submit_healthcheck(executor, healthcheck, tier) for healthcheck in healthchecks]
+        responses = []
+        for healthcheck, future in zip(healthchecks, futures):
+            timeout = self.get_healthcheck_deadline(healthcheck, deadline)
+            if timeout is not None:
+                timeout = max(0, started + timeout - time.monotonic())
             try:
-                if inspect.isclass(healthcheck):
-                    healthcheck = healthcheck()
-                response = healthcheck()
-                if isinstance(response, bool):
-                    response = HealthcheckResponse(
-                        name=get_healthcheck_name(healthcheck),
-                        status=response,
-                    )
-            except Exception as e:
-                response = HealthcheckResponse(
-                    name=get_healthcheck_name(healthcheck),
-                    status=False,
-                    exception=str(e),
-                    exception_class=e.__class__.__name__,
-                )
+                response = future.result(timeout=timeout)
+            except (FutureTimeoutError, CancelledError):
+                # pooled runs may be shared with other callers, so are left to finish rather than cancelled
+                response = self.timed_out_response(healthcheck, time.monotonic() - started)
             responses.append(response)
         return responses
 
+    def run_healthchecks_in_dependency_order(self, healthchecks, max_workers, deadline=None, tier=None):
+        """
+        Runs healthchecks on a thread pool, each as soon as all those it depends
+        on have passed. If one of them fails, it is not run and is reported as
+        `skipped`. Healthchecks that have not finished by the sooner of the
+        global deadline and their own `timeout` attribute, counted from when
+        they start, are reported as timed out.
+        """
+        dependencies, order, circular = self.get_dependency_graph(healthchecks)
+        executor = self.get_executor(max_workers)
+        started = time.monotonic()
+        responses = [None] * len(healthchecks)
+        for index in circular:
+            responses[index] = self.circular_dependency_response(healthchecks[index])
+        running = {}
+        expires_at = {}
+        while True:
+            for index in order:
+                if responses[index] is None and index not in running.values():
+                    self.start_healthcheck_if_ready(
+                        executor, healthchecks, dependencies, index, responses, running, tier,
+                    )
+            if not running:
+                break
+            timeout = self.get_running_healthchecks_timeout(healthchecks, running, expires_at, started, deadline)
+            finished, _ = wait_for_futures(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            self.collect_running_healthchecks(healthchecks, finished, running, expires_at, responses, started)
+            if deadline is not None and time.monotonic() >= started + deadline:
+                break
+        for index in running.values():
+            responses[index] = self.timed_out_response(healthchecks[index], time.monotonic() - started)
+        return [
+            response or self.timed_out_response(healthcheck, 0)
+            for healthcheck, response in zip(healthchecks, responses)
+        ]
+
+    def get_running_healthchecks_timeout(self, healthchecks, running, expires_at, started, deadline=None):
+        # each healthcheck's own timeout counts from when it starts, within what is left of the deadline
+        now = time.monotonic()
+        for index in running.values():
+            if index not in expires_at:
+                remaining = None if deadline is None else max(0, started + deadline - now)
+                timeout = self.get_healthcheck_deadline(healthchecks[index], remaining)
+                expires_at[index] = None if timeout is None else now + timeout
+        expiries = [expires_at[index] for index in running.values() if expires_at[index] is not None]
+        return max(0, min(expiries) - now) if expiries else None
+
+    def collect_running_healthchecks(self, healthchecks, finished, running, expires_at, responses, started):
+        for future in finished:
+            index = running.pop(future)
+            if future.cancelled():
+                responses[index] = self.timed_out_response(healthchecks[index], time.monotonic() - started)
+            else:
+                responses[index] = future.result()
+        now = time.monotonic()
+        for future, index in list(running.items()):
+            if expires_at[index] is not None and expires_at[index] <= now:
+                # pooled runs may be shared with other callers, so are left to finish rather than cancelled
+                del running[future]
+                responses[index] = self.timed_out_response(healthchecks[index], now - started)
+
+    def start_healthcheck_if_ready(self, executor, healthchecks, dependencies, index, responses, running, tier):
+        dependency_responses = [responses[dependency] for dependency in dependencies[index]]
+        failed = [response for response in dependency_responses if response is not None and not response.status]
+        if failed:
+            responses[index] = self.dependency_failed_response(healthchecks[index], failed[0])
+        elif all(dependency_responses):
+            running[self.submit_healthcheck(executor, healthchecks[index], tier)] = index
+
+    def submit_healthcheck(self, executor, healthcheck, tier=None):
+        """
+        Runs a healthcheck on the thread pool. While an abandoned run is still
+        using a pool thread, later runs wait for it instead of taking another,
+        so a healthcheck that hangs never holds more than one thread.
+        """
+        name = get_healthcheck_name(healthcheck)
+        with self._pooled_runs_lock:
+            future = self._pooled_runs.get(name)
+            if future is None or future.done():
+                future = self._pooled_runs[name] = executor.submit(self.run_pooled_healthcheck, healthcheck, tier)
+        return future
+
+    def run_pooled_healthcheck(self, healthcheck, tier=None):
+        from django.db import close_old_connections
+
+        # pool threads are long-lived, so connections are closed as they would be after a request
+        close_old_connections()
+        try:
+            return self.run_healthcheck(healthcheck, tier)
+        finally:
+            close_old_connections()
+
+    def get_executor(self, max_workers):
+        with self._executor_lock:
+            executor = self._executors.get(max_workers)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='healthcheck')
+                self._executors[max_workers] = executor
+            return executor
+
+    @classmethod
+    def get_healthcheck_timeout(cls, healthcheck):
+        """
+        Seconds after which a healthcheck is abandoned, taken from its `timeout`
+        attribute (see `healthcheck_timeout`) or settings.HEALTHCHECK_TIMEOUT.
+        Healthchecks with `enforces_timeout = True` apply it themselves, so they
+        are not run on a thread of their own to enforce it.
+        """
+        timeout = get_number_attribute(healthcheck, 'timeout')
+        if timeout is None:
+            timeout = getattr(settings, 'HEALTHCHECK_TIMEOUT', None)
+        return timeout
+
+    @classmethod
+    def get_healthcheck_deadline(cls, healthcheck, deadline=None):
+        timeout = cls.get_healthcheck_timeout(healthcheck)
+        if timeout is None:
+            return deadline
+        if deadline is None:
+            return timeout
+        return min(timeout, deadline)
+
+    def timed_out_response(self, healthcheck, duration):
+        """
+        Returns the response of a healthcheck abandoned at the deadline. Its
+        outcome is not recorded here: a run left in a thread records it when
+        it finishes and a cancelled async run when it is cancelled, so each
+        attempt is only counted once.
+        """
+        response = HealthcheckResponse(
+            name=get_healthcheck_name(healthcheck),
+            status=False,
+            error='Timed out',
+            timed_out=True,
+        )
+        response.set_duration(duration)
+        return response
+
+    def save_metrics(self):
+        """
+        Shares this process's metrics with other workers if
+        settings.HEALTHCHECK_METRICS_DIRECTORY is set
+        """
+        directory = getattr(settings, 'HEALTHCHECK_METRICS_DIRECTORY', None)
+        if directory:
+            try:
+                self.metrics.write_snapshot(directory)
+            except OSError:
+                logger.exception('Cannot save healthcheck metrics')
+
+    @classmethod
+    def get_cache_ttl(cls, healthcheck, tier=None):
+        """
+        Seconds for which a healthcheck's result is reused, taken from its
+        `cache_ttl` attribute, the tier's settings or settings.HEALTHCHECK_CACHE_TTL;
+        0 disables caching.
+        """
+        cache_ttl = get_number_attribute(healthcheck, 'cache_ttl')
+        if cache_ttl is None:
+            cache_ttl = cls.get_setting('cache_ttl', tier, 0)
+        return cache_ttl
+
+    def get_result_store(self):
+        """
+        Returns the store for sharing results between worker processes configured by
+        settings.HEALTHCHECK_RESULT_STORE (a dotted path to a `moj_irat.stores.ResultStore`)
+        and settings.HEALTHCHECK_RESULT_STORE_OPTIONS, or None
+        """
+        path = getattr(settings, 'HEALTHCHECK_RESULT_STORE', None)
+        if not path:
+            return None
+        options = getattr(settings, 'HEALTHCHECK_RESULT_STORE_OPTIONS', {})
+        key = (path, repr(options))
+        result_store = self._result_store
+        if result_store is None or result_store[0] != key:
+            result_store = self._result_store = (key, import_string(path)(**options))
+        return result_store[1]
+
+    def run_healthcheck(self, healthcheck, tier=None):
+        """
+        Runs a single healthcheck or returns its cached response, reporting
+        any error in applying its options as a failure of that healthcheck only
+        """
+        try:
+            return self.run_cached_healthcheck(healthcheck, tier)
+        except Exception as e:
+            logger.exception('Cannot run healthcheck %s', get_healthcheck_name(healthcheck))
+            return self.exception_response(healthcheck, e)
+
+    def run_cached_healthcheck(self, healthcheck, tier=None):
+        """
+        Runs a single healthcheck or returns its cached response.
+        An expired response is still returned while a single background
+        refresh replaces it (stale-while-revalidate).
+        """
+        cache_ttl = self.get_cache_ttl(healthcheck, tier)
+        if not cache_ttl:
+            return self.probe_healthcheck(healthcheck)
+
+        name = get_healthcheck_name(healthcheck)
+        result_store = self.get_result_store()
+        if result_store is not None:
+            cached = self.run_shared_healthcheck(result_store, name, healthcheck, cache_ttl)
+            if cached is not None:
+                return cached.get_response()
+
+        cached = self._cache.get(name)
+        if cached is None:
+            return self.refresh_healthcheck(name, healthcheck).get_response()
+        if cached.age >= cache_ttl:
+            self.start_background_refresh(name, healthcheck)
+        return cached.get_response()
+
+    def run_shared_healthcheck(self, result_store, name, healthcheck, cache_ttl):
+        """
+        Returns a result shared by all worker processes, running the healthcheck
+        if the result has expired and no other worker is already doing so.
+        Returns None if there is no shared result recent enough to use, e.g.
+        because the worker refreshing it died, or the store cannot be used;
+        the healthcheck is then run locally instead.
+        """
+        try:
+            record = result_store.get(name)
+            cached = CachedHealthcheckResponse.from_record(record) if record else None
+            if cached is not None and cached.age < cache_ttl:
+                return cached
+            if result_store.acquire(name):
+                try:
+                    cached = CachedHealthcheckResponse(self.probe_healthcheck(healthcheck))
+                    result_store.set(name, cached.get_record())
+                finally:
+                    result_store.release(name)
+                return cached
+        except Exception:
+            logger.exception('Cannot use shared result of healthcheck %s', name)
+            return None
+        max_age = getattr(settings, 'HEALTHCHECK_RESULT_STORE_MAX_AGE', None) or cache_ttl * 3
+        if cached is not None and cached.age < max_age:
+            # another worker is refreshing it
+            return cached
+        return None
+
+    def refresh_healthcheck(self, name, healthcheck):
+        cached = CachedHealthcheckResponse(self.probe_healthcheck(healthcheck))
+        with self._cache_lock:
+            self._cache[name] = cached
+        return cached
+
+    def start_background_refresh(self, name, healthcheck):
+        with self._cache_lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def background_refresh():
+            try:
+                self.refresh_healthcheck(name, healthcheck)
+                self.save_metrics()
+            finally:
+                with self._cache_lock:
+                    self._refreshing.discard(name)
+
+        thread = threading.Thread(target=background_refresh, name='healthcheck-refresh-%s' % name, daemon=True)
+        thread.start()
+
+    def get_circuit_breaker(self, healthcheck):
+        """
+        Returns the healthcheck's circuit breaker, or None if it is not enabled by its
+        `circuit_breaker_threshold` attribute or settings.HEALTHCHECK_CIRCUIT_BREAKER_THRESHOLD
+        """
+        threshold = get_number_attribute(healthcheck, 'circuit_breaker_threshold')
+        if threshold is None:
+            threshold = getattr(settings, 'HEALTHCHECK_CIRCUIT_BREAKER_THRESHOLD', 0)
+        if not threshold:
+            return None
+        name = get_healthcheck_name(healthcheck)
+        circuit_breaker = self._circuit_breakers.get(name)
+        if circuit_breaker is None:
+            cooldown = get_number_attribute(healthcheck, 'circuit_breaker_cooldown')
+            if cooldown is None:
+                cooldown = getattr(settings, 'HEALTHCHECK_CIRCUIT_BREAKER_COOLDOWN', 30)
+            with self._circuit_breakers_lock:
+                circuit_breaker = self._circuit_breakers.setdefault(name, CircuitBreaker(threshold, cooldown))
+        return circuit_breaker
+
+    @classmethod
+    def open_circuit_response(cls, healthcheck, circuit_breaker):
+        return HealthcheckResponse(
+            name=get_healthcheck_name(healthcheck),
+            status=False,
+            error='Not run after %s consecutive failures' % circuit_breaker.failures,
+            circuit=circuit_breaker.state,
+            last_attempt=circuit_breaker.get_last_attempt(),
+        )
+
+    def get_rate_limiter(self, healthcheck):
+        """
+        Returns the healthcheck's token bucket, or None if it is not limited by its
+        `rate_limit` attribute or settings.HEALTHCHECK_RATE_LIMIT (runs per second)
+        """
+        rate = get_number_attribute(healthcheck, 'rate_limit')
+        if rate is None:
+            rate = getattr(settings, 'HEALTHCHECK_RATE_LIMIT', 0)
+        if not rate:
+            return None
+        name = get_healthcheck_name(healthcheck)
+        rate_limiter = self._rate_limiters.get(name)
+        if rate_limiter is None:
+            burst = get_number_attribute(healthcheck, 'rate_limit_burst')
+            if burst is None:
+                burst = getattr(settings, 'HEALTHCHECK_RATE_LIMIT_BURST', 1)
+            with self._rate_limiters_lock:
+                rate_limiter = self._rate_limiters.setdefault(name, TokenBucket(rate, max(1, burst)))
+        return rate_limiter
+
+    def rate_limited_response(self, healthcheck):
+        """
+        Returns the last result of a healthcheck that has run too often
+        """
+        name = get_healthcheck_name(healthcheck)
+        response = self._last_responses.get(name)
+        if response is None:
+            # only possible while the first runs are still in progress
+            return HealthcheckResponse(name=name, status=False, error='Not checked yet', rate_limited=True)
+        return response.copy(rate_limited=True)
+
+    def remember_response(self, healthcheck, response, rate_limiter):
+        if rate_limiter is not None:
+            self._last_responses[get_healthcheck_name(healthcheck)] = response
+        return response
+
+    def probe_healthcheck(self, healthcheck):
+        """
+        Runs a single healthcheck unless it is rate limited or its circuit breaker is open
+        """
+        rate_limiter = self.get_rate_limiter(healthcheck)
+        if rate_limiter is not None and not rate_limiter.consume():
+            return self.rate_limited_response(healthcheck)
+        circuit_breaker = self.get_circuit_breaker(healthcheck)
+        if circuit_breaker is None:
+            return self.remember_response(healthcheck, self.execute_healthcheck(healthcheck), rate_limiter)
+        if not circuit_breaker.allow():
+            return self.open_circuit_response(healthcheck, circuit_breaker)
+        response = self.execute_healthcheck(healthcheck)
+        circuit_breaker.record(response.status)
+        response.kwargs['circuit'] = circuit_breaker.state
+        return self.remember_response(healthcheck, response, rate_limiter)
+
+    async def aprobe_healthcheck(self, healthcheck):
+        """
+        Runs a single async healthcheck unless it is rate limited or its circuit breaker is open
+        """
+        rate_limiter = self.get_rate_limiter(healthcheck)
+        if rate_limiter is not None and not rate_limiter.consume():
+            return self.rate_limited_response(healthcheck)
+        circuit_breaker = self.get_circuit_breaker(healthcheck)
+        if circuit_breaker is None:
+            return self.remember_response(healthcheck, await self.aexecute_healthcheck(healthcheck), rate_limiter)
+        if not circuit_breaker.allow():
+            return self.open_circuit_response(healthcheck, circuit_breaker)
+        try:
+            response = await self.aexecute_healthcheck(healthcheck)
+        except asyncio.CancelledError:
+            circuit_breaker.record(False)
+            raise
+        circuit_breaker.record(response.status)
+        response.kwargs['circuit'] = circuit_breaker.state
+        return self.remember_response(healthcheck, response, rate_limiter)
+
+    def execute_healthcheck(self, healthcheck):
+        """
+        Runs a single healthcheck, converting its result or exception
+        into a HealthcheckResponse and recording how long it took.
+        """
+        started = time.monotonic()
+        try:
+            healthcheck = self.get_healthcheck_instance(healthcheck)
+            timeout = self.get_healthcheck_timeout(healthcheck)
+            if timeout is None or getattr(healthcheck, 'enforces_timeout', False):
+                response = call_healthcheck(healthcheck)
+            else:
+                response = self.call_healthcheck_with_timeout(healthcheck, timeout)
+            response = self.make_response(healthcheck, response)
+        except Exception as e:
+            response = self.exception_response(healthcheck, e)
+        return self.record_response(response, time.monotonic() - started)
+
+    def call_healthcheck_with_timeout(self, healthcheck, timeout):
+        """
+        Calls a healthcheck on its own daemon thread, which is abandoned if it
+        does not finish in time. While an abandoned call is still running, later
+        runs wait for it rather than starting another thread, so a healthcheck
+        that hangs never has more than one thread stuck in it.
+        """
+        name = get_healthcheck_name(healthcheck)
+        with self._timed_calls_lock:
+            future = self._timed_calls.get(name)
+            if future is None or future.done():
+                future = self._timed_calls[name] = Future()
+                threading.Thread(
+                    target=call_healthcheck_into_future, args=(healthcheck, future),
+                    name='healthcheck-%s' % name, daemon=True,
+                ).start()
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            raise Timeout('Did not finish within %s seconds' % timeout)
+
+    async def aexecute_healthcheck(self, healthcheck):
+        """
+        Runs a single async healthcheck, converting its result or exception
+        into a HealthcheckResponse and recording how long it took.
+        """
+        started = time.monotonic()
+        try:
+            healthcheck = self.get_healthcheck_instance(healthcheck)
+            timeout = self.get_healthcheck_timeout(healthcheck)
+            try:
+                response = await asyncio.wait_for(healthcheck(), timeout)
+            except asyncio.TimeoutError:
+                raise Timeout('Did not finish within %s seconds' % timeout)
+            response = self.make_response(healthcheck, response)
+        except asyncio.CancelledError:
+            # abandoned at the deadline, so it will not finish and be recorded otherwise
+            self.record_response(self.timed_out_response(healthcheck, 0), time.monotonic() - started)
+            raise
+        except Exception as e:
+            response = self.exception_response(healthcheck, e)
+        return self.record_response(response, time.monotonic() - started)
+
+    def record_response(self, response, duration):
+        response.set_duration(duration)
+        self.metrics.observe(response.name, duration, response.status)
+        self.record_history(response.name, response.status, duration)
+        for member in getattr(response, 'responses', ()):
+            member_duration = duration if member.duration_ms is None else member.duration_ms / 1000
+            self.metrics.observe(member.name, member_duration, member.status)
+            self.record_history(member.name, member.status, member_duration)
+        return response
+
+    def record_history(self, name, status, duration):
+        """
+        Keeps the last settings.HEALTHCHECK_HISTORY_SIZE results of each healthcheck
+        """
+        size = getattr(settings, 'HEALTHCHECK_HISTORY_SIZE', 0)
+        flapping_threshold = getattr(settings, 'HEALTHCHECK_FLAPPING_THRESHOLD', 0.3)
+        if size != self.history.size or flapping_threshold != self.history.flapping_threshold:
+            self.history.configure(size, flapping_threshold)
+        self.history.record(name, status, duration)
+
+    @classmethod
+    def make_response(cls, healthcheck, response):
+        if isinstance(response, bool):
+            response = HealthcheckResponse(
+                name=get_healthcheck_name(healthcheck),
+                status=response,
+            )
+        elif isinstance(response, list):
+            response = HealthcheckResponseGroup(
+                get_healthcheck_name(healthcheck),
+                [cls.make_response(healthcheck, member) for member in response],
+            )
+        return response
+
+    @classmethod
+    def exception_response(cls, healthcheck, e):
+        response = HealthcheckResponse(
+            name=get_healthcheck_name(healthcheck),
+            status=False,
+            exception=str(e),
+            exception_class=e.__class__.__name__,
+        )
+        if isinstance(e, Timeout):
+            response.kwargs['timed_out'] = True
+        return response
+
+    async def arun_healthchecks(self, tier=None):
+        """
+        Async variant of `run_healthchecks` for use under ASGI.
+        Async healthchecks are awaited together on the running event loop;
+        synchronous ones run in worker threads. Each is limited by its own
+        `timeout` attribute and settings.HEALTHCHECK_DEADLINE.
+        """
+        if self.scheduler.enabled:
+            return flatten_responses(self.scheduler.get_responses(tier))
+        return flatten_responses(await self.acoalesce_run(tier or '*', lambda: self.arun_registered_healthchecks(tier)))
+
+    async def acoalesce_run(self, key, run):
+        """
+        Awaits `run` unless a run with the same key is already in progress
+        on the current event loop, in which case its result is shared.
+        """
+        loop = asyncio.get_running_loop()
+        run_key = (key, loop)
+        task = self._async_runs.get(run_key)
+        if task is None:
+            task = loop.create_task(run())
+            self._async_runs[run_key] = task
+            task.add_done_callback(lambda _: self._async_runs.pop(run_key, None))
+        return list(await asyncio.shield(task))
+
+    async def arun_registered_healthchecks(self, tier=None):
+        from asgiref.sync import sync_to_async
+
+        if self._registry_loaded and not self.has_unresolved_healthchecks():
+            healthchecks = self.get_healthchecks(tier)
+        else:
+            # loading imports modules, which should not block the event loop
+            healthchecks = await sync_to_async(self.get_healthchecks)(tier)
+        deadline = self.get_setting('deadline', tier)
+        started = time.monotonic()
+        dependencies, order, circular = self.get_dependency_graph(healthchecks)
+        tasks = {}
+        for index in circular:
+            tasks[index] = asyncio.get_running_loop().create_future()
+            tasks[index].set_result(self.circular_dependency_response(healthchecks[index]))
+
+        async def run_after_dependencies(index):
+            for dependency in dependencies[index]:
+                dependency_response = await tasks[dependency]
+                if not dependency_response.status:
+                    return self.dependency_failed_response(healthchecks[index], dependency_response)
+            return await self.arun_healthcheck(healthchecks[index], started, deadline, tier)
+
+        for index in order:
+            tasks[index] = asyncio.ensure_future(run_after_dependencies(index))
+        responses = await asyncio.gather(*(tasks[index] for index in range(len(healthchecks))))
+        self.save_metrics()
+        return responses
+
+    async def arun_healthcheck(self, healthcheck, started, deadline=None, tier=None):
+        if is_async_healthcheck(healthcheck):
+            response = self.arun_async_healthcheck(healthcheck, tier)
+        else:
+            # runs on the shared pool so that a hung healthcheck holds one thread however often it is polled;
+            # shielded because the pooled run may be shared with other callers
+            executor = self.get_executor(self.get_setting('max_workers', tier) or self.default_async_workers)
+            response = asyncio.shield(asyncio.wrap_future(self.submit_healthcheck(executor, healthcheck, tier)))
+        if deadline is not None:
+            # dependants start late, so only have what is left of the deadline
+            deadline = max(0, started + deadline - time.monotonic())
+        try:
+            return await asyncio.wait_for(response, self.get_healthcheck_deadline(healthcheck, deadline))
+        except asyncio.TimeoutError:
+            return self.timed_out_response(healthcheck, time.monotonic() - started)
+
+    async def arun_async_healthcheck(self, healthcheck, tier=None):
+        """
+        Async variant of `run_healthcheck` for async healthchecks
+        """
+        try:
+            return await self.arun_cached_healthcheck(healthcheck, tier)
+        except Exception as e:
+            logger.exception('Cannot run healthcheck %s', get_healthcheck_name(healthcheck))
+            return self.exception_response(healthcheck, e)
+
+    async def arun_cached_healthcheck(self, healthcheck, tier=None):
+        """
+        Async variant of `run_cached_healthcheck` for async healthchecks, which
+        share its cache and result store
+        """
+        from asgiref.sync import sync_to_async
+
+        cache_ttl = self.get_cache_ttl(healthcheck, tier)
+        if not cache_ttl:
+            return await self.aprobe_healthcheck(healthcheck)
+
+        name = get_healthcheck_name(healthcheck)
+        result_store = self.get_result_store()
+        if result_store is not None:
+            # stores do blocking I/O
+            cached = await sync_to_async(self.run_shared_healthcheck, thread_sensitive=False)(
+                result_store, name, healthcheck, cache_ttl,
+            )
+            if cached is not None:
+                return cached.get_response()
+
+        cached = self._cache.get(name)
+        if cached is None:
+            cached = CachedHealthcheckResponse(await self.aprobe_healthcheck(healthcheck))
+            with self._cache_lock:
+                self._cache[name] = cached
+            return cached.get_response()
+        if cached.age >= cache_ttl:
+            # refreshed in a thread so that it outlives this event loop if necessary
+            self.start_background_refresh(name, healthcheck)
+        return cached.get_response()
+
 
 registry = HealthcheckRegistry()
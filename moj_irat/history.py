@@ -0,0 +1,121 @@
+from array import array
+import math
+import threading
+
+
+class ResultRing:
+    """
+    The last `size` results and durations of a healthcheck, kept in
+    fixed-size arrays that are overwritten oldest first
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.statuses = array('b', bytes(size))
+        self.durations = array('d', bytes(8 * size))
+        self.count = 0
+
+    def record(self, status, duration):
+        position = self.count % self.size
+        self.statuses[position] = 1 if status else 0
+        self.durations[position] = duration
+        self.count += 1
+
+    def get_results(self):
+        """
+        Returns statuses and durations from oldest to newest
+        """
+        if self.count <= self.size:
+            return list(self.statuses[:self.count]), list(self.durations[:self.count])
+        position = self.count % self.size
+        statuses = self.statuses[position:] + self.statuses[:position]
+        durations = self.durations[position:] + self.durations[:position]
+        return list(statuses), list(durations)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarise(statuses, durations, flapping_threshold):
+    """
+    Returns the success rate, 95th percentile duration and whether the status
+    changed in at least `flapping_threshold` of consecutive pairs of runs
+    """
+    changes = sum(1 for previous, status in zip(statuses, statuses[1:]) if previous != status)
+    return {
+        'runs': len(statuses),
+        'success_rate': round(sum(statuses) / len(statuses), 4),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 3),
+        'flapping': changes >= 2 and changes >= flapping_threshold * (len(statuses) - 1),
+    }
+
+
+class HealthcheckHistory:
+    """
+    Recent results of each healthcheck in this process, used to report
+    success rates and latency and to detect healthchecks that flap between
+    passing and failing. Memory use is bounded by the number of healthchecks.
+    """
+
+    def __init__(self, size=0, flapping_threshold=0.3):
+        self.size = size
+        self.flapping_threshold = flapping_threshold
+        self._lock = threading.Lock()
+        self._rings = {}
+
+    def reset(self):
+        with self._lock:
+            self._rings = {}
+
+    def configure(self, size, flapping_threshold):
+        """
+        Changes the number of results kept, which forgets those recorded so far
+        """
+        with self._lock:
+            if size != self.size:
+                self._rings = {}
+            self.size = size
+            self.flapping_threshold = flapping_threshold
+
+    def record(self, name, status, duration):
+        if not self.size:
+            return
+        with self._lock:
+            ring = self._rings.get(name)
+            if ring is None:
+                ring = self._rings[name] = ResultRing(self.size)
+            ring.record(status, duration)
+
+    def get_results(self, name):
+        with self._lock:
+            ring = self._rings.get(name)
+            if ring is None:
+                return None
+            return ring.get_results()
+
+    def get_summary(self, name):
+        results = self.get_results(name)
+        if results is None:
+            return None
+        return summarise(*results, flapping_threshold=self.flapping_threshold)
+
+    def snapshot(self):
+        """
+        Returns the summary and recent results of each healthcheck
+        """
+        with self._lock:
+            names = list(self._rings)
+        history = {}
+        for name in names:
+            results = self.get_results(name)
+            if results is None:
+                continue
+            statuses, durations = results
+            history[name] = dict(
+                summarise(statuses, durations, self.flapping_threshold),
+                results=[bool(status) for status in statuses],
+                durations_ms=[round(duration * 1000, 3) for duration in durations],
+            )
+        return history
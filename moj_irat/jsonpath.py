@@ -0,0 +1,159 @@
+import operator
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+
+WILDCARD = '*'
+
+
+def _matches_regex(value, pattern):
+    return isinstance(value, str) and pattern.search(value) is not None
+
+
+def _is_in(value, expected):
+    return value in expected
+
+
+# operator name: (comparison of found value against expected value, description used in errors)
+OPERATORS = {
+    'equals': (operator.eq, 'did not contain'),
+    'in': (_is_in, 'was not in'),
+    'regex': (_matches_regex, 'did not match'),
+    'gt': (operator.gt, 'was not greater than'),
+    'gte': (operator.ge, 'was not at least'),
+    'lt': (operator.lt, 'was not less than'),
+    'lte': (operator.le, 'was not at most'),
+}
+
+
+class JsonPathAssertion:
+    """
+    Expected value at a dotted path in a JSON document, e.g. `results.0.status`.
+    A `*` segment matches every item in a list or object, in which case all
+    matched values must satisfy the assertion.
+    """
+
+    def __init__(self, expected_value, path, operator_name='equals'):
+        if not isinstance(path, str) or not path:
+            raise ImproperlyConfigured('JSON path must be a non-empty string')
+        segments = path.split('.')
+        if not all(segments):
+            raise ImproperlyConfigured('JSON path "%s" has an empty segment' % path)
+        if operator_name not in OPERATORS:
+            raise ImproperlyConfigured('JSON path operator "%s" is not one of %s' %
+                                       (operator_name, ', '.join(OPERATORS)))
+        if operator_name == 'regex':
+            try:
+                expected_value = re.compile(expected_value)
+            except (re.error, TypeError) as e:
+                raise ImproperlyConfigured('JSON path regex "%s" is invalid: %s' % (expected_value, e))
+        elif operator_name == 'in' and not hasattr(expected_value, '__contains__'):
+            raise ImproperlyConfigured('JSON path operator "in" needs a collection of values')
+        self.expected_value = expected_value
+        self.path = path
+        self.segments = segments
+        self.operator_name = operator_name
+        self.compare, self.description = OPERATORS[operator_name]
+
+    def check(self, values):
+        """
+        Returns an error message unless all values found at the path satisfy the assertion
+        """
+        if not values:
+            return 'Response JSON path "%s" does not exist' % self.path
+        for value in values:
+            try:
+                passed = self.compare(value, self.expected_value)
+            except TypeError:
+                passed = False
+            if not passed:
+                expected_value = self.expected_value
+                if self.operator_name == 'regex':
+                    expected_value = expected_value.pattern
+                return 'Response JSON path "%s" %s "%s"' % (self.path, self.description, expected_value)
+
+
+class JsonPathNode:
+    def __init__(self):
+        self.children = {}
+        self.assertions = []
+
+
+class JsonPathAssertions:
+    """
+    A set of JSON path assertions compiled into a tree of path segments
+    so that they can all be evaluated in one pass over a document
+    """
+
+    def __init__(self, assertions):
+        self.assertions = list(assertions)
+        self.root = JsonPathNode()
+        for index, assertion in enumerate(self.assertions):
+            node = self.root
+            for segment in assertion.segments:
+                node = node.children.setdefault(segment, JsonPathNode())
+            node.assertions.append(index)
+        self.root = self.compile_node(self.root)
+
+    @classmethod
+    def compile_node(cls, node):
+        # replace segments with (key, list index) pairs
+        node.children = [
+            (segment, int(segment) if segment.lstrip('-').isdigit() else None, cls.compile_node(child))
+            for segment, child in node.children.items()
+        ]
+        return node
+
+    @classmethod
+    def from_setting(cls, value_at_json_path):
+        """
+        Compiles `(value, path)`, `(value, path, operator)` or a list of these
+        """
+        if value_at_json_path is None:
+            return None
+        if isinstance(value_at_json_path, tuple) and len(value_at_json_path) in (2, 3) and \
+                isinstance(value_at_json_path[1], str):
+            value_at_json_path = [value_at_json_path]
+        try:
+            return cls(JsonPathAssertion(*assertion) for assertion in value_at_json_path)
+        except TypeError:
+            raise ImproperlyConfigured('JSON path assertions must be tuples of (value, path[, operator])')
+
+    @classmethod
+    def select(cls, data, key, index):
+        if key == WILDCARD:
+            if isinstance(data, dict):
+                return list(data.values())
+            if isinstance(data, list):
+                return data
+        elif isinstance(data, dict):
+            if key in data:
+                return [data[key]]
+        elif isinstance(data, list) and index is not None:
+            if -len(data) <= index < len(data):
+                return [data[index]]
+        return []
+
+    def find_values(self, document):
+        """
+        Walks the document once, returning the values found for each assertion
+        """
+        found = [[] for _ in self.assertions]
+        stack = [(self.root, document)]
+        while stack:
+            node, data = stack.pop()
+            for index in node.assertions:
+                found[index].append(data)
+            for key, index, child in node.children:
+                for value in self.select(data, key, index):
+                    stack.append((child, value))
+        return found
+
+    def check(self, document):
+        """
+        Returns the error message of the first failed assertion
+        """
+        for assertion, values in zip(self.assertions, self.find_values(document)):
+            error = assertion.check(values)
+            if error:
+                return error
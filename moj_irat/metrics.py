@@ -0,0 +1,184 @@
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class HealthcheckMetrics:
+    """
+    In-memory latency histograms and pass/fail counters for each healthcheck.
+    Snapshots are plain dicts so that they can be shared between worker
+    processes through files in a directory and added together.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def reset(self):
+        with self._lock:
+            self._metrics = {}
+
+    def observe(self, name, duration, status):
+        """
+        Records a healthcheck run that took `duration` seconds
+        """
+        bucket = len(self.buckets)
+        for index, upper_bound in enumerate(self.buckets):
+            if duration <= upper_bound:
+                bucket = index
+                break
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0,
+                    'passed': 0,
+                    'failed': 0,
+                    'status': status,
+                    'updated_at': 0,
+                }
+            metric['buckets'][bucket] += 1
+            metric['sum'] += duration
+            metric['passed' if status else 'failed'] += 1
+            metric['status'] = status
+            metric['updated_at'] = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'healthchecks': {
+                    name: dict(metric, buckets=list(metric['buckets']))
+                    for name, metric in self._metrics.items()
+                },
+            }
+
+    def write_snapshot(self, directory):
+        """
+        Saves a snapshot of this process's metrics into a shared directory
+        """
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=str(directory), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary_path, str(directory / ('healthcheck-metrics-%s.json' % os.getpid())))
+
+
+def process_exists(pid):
+    if pid <= 0:
+        return False
+    if os.name != 'posix':
+        # cannot be checked without affecting the process
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshots(directory, max_age=None):
+    """
+    Loads snapshots saved by all worker processes on this host into a directory.
+    Snapshots of processes that have exited, or that were last saved more than
+    `max_age` seconds ago in case the process id has been reused, are deleted.
+    """
+    snapshots = []
+    now = time.time()
+    for path in sorted(pathlib.Path(directory).glob('healthcheck-metrics-*.json')):
+        try:
+            pid = int(path.stem.rsplit('-', 1)[1])
+            modified_at = path.stat().st_mtime
+        except (OSError, ValueError):
+            continue
+        if not process_exists(pid) or (max_age and now - modified_at > max_age):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            continue
+        try:
+            with path.open() as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    """
+    Adds together snapshots which have the same histogram buckets,
+    taking the status of each healthcheck from its latest run
+    """
+    merged = {'buckets': list(DEFAULT_BUCKETS), 'healthchecks': {}}
+    for snapshot in snapshots:
+        merged['buckets'] = snapshot['buckets']
+        for name, metric in snapshot['healthchecks'].items():
+            merged_metric = merged['healthchecks'].get(name)
+            if merged_metric is None or len(merged_metric['buckets']) != len(metric['buckets']):
+                merged['healthchecks'][name] = dict(metric, buckets=list(metric['buckets']))
+                continue
+            merged_metric['buckets'] = [a + b for a, b in zip(merged_metric['buckets'], metric['buckets'])]
+            merged_metric['sum'] += metric['sum']
+            merged_metric['passed'] += metric['passed']
+            merged_metric['failed'] += metric['failed']
+            if metric.get('updated_at', 0) >= merged_metric.get('updated_at', 0):
+                merged_metric['status'] = metric['status']
+                merged_metric['updated_at'] = metric.get('updated_at', 0)
+    return merged
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render_prometheus(snapshot):
+    """
+    Renders a metrics snapshot in the Prometheus text exposition format
+    """
+    upper_bounds = [format_number(bucket) for bucket in snapshot['buckets']] + ['+Inf']
+    healthchecks = sorted(snapshot['healthchecks'].items())
+    lines = [
+        '# HELP healthcheck_duration_seconds Time taken to run healthchecks.',
+        '# TYPE healthcheck_duration_seconds histogram',
+    ]
+    for name, metric in healthchecks:
+        label = 'healthcheck="%s"' % escape_label(name)
+        count = 0
+        for upper_bound, bucket_count in zip(upper_bounds, metric['buckets']):
+            count += bucket_count
+            lines.append('healthcheck_duration_seconds_bucket{%s,le="%s"} %s' % (label, upper_bound, count))
+        lines.append('healthcheck_duration_seconds_sum{%s} %s' % (label, format_number(metric['sum'])))
+        lines.append('healthcheck_duration_seconds_count{%s} %s' % (label, count))
+    lines += [
+        '# HELP healthcheck_runs_total Healthcheck runs by result.',
+        '# TYPE healthcheck_runs_total counter',
+    ]
+    for name, metric in healthchecks:
+        label = 'healthcheck="%s"' % escape_label(name)
+        lines.append('healthcheck_runs_total{%s,status="passed"} %s' % (label, metric['passed']))
+        lines.append('healthcheck_runs_total{%s,status="failed"} %s' % (label, metric['failed']))
+    lines += [
+        '# HELP healthcheck_status Whether the latest run of a healthcheck passed.',
+        '# TYPE healthcheck_status gauge',
+    ]
+    for name, metric in healthchecks:
+        label = 'healthcheck="%s"' % escape_label(name)
+        lines.append('healthcheck_status{%s} %s' % (label, 1 if metric['status'] else 0))
+    return '\n'.join(lines) + '\n'
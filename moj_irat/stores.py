@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class ResultStore:
+    """
+    Storage for healthcheck results shared by worker processes. Records are
+    dicts of a response's `get_dict()` and the time it was made. Only the
+    worker holding a healthcheck's lock runs it and saves the result.
+    """
+
+    def get(self, name):
+        """
+        Returns the saved record for a healthcheck or None
+        """
+        raise NotImplementedError
+
+    def set(self, name, record):
+        raise NotImplementedError
+
+    def acquire(self, name):
+        """
+        Takes the lock for refreshing a healthcheck without waiting,
+        returning whether it was taken
+        """
+        raise NotImplementedError
+
+    def release(self, name):
+        raise NotImplementedError
+
+
+class FileResultStore(ResultStore):
+    """
+    Shares results between worker processes on one host through files in a
+    directory. Locks are `flock` locks, so they are released if a worker dies.
+    """
+
+    def __init__(self, directory):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_files = {}
+        self._lock_files_lock = threading.Lock()
+
+    def get_path(self, name, suffix):
+        # names can contain any characters
+        return self.directory / ('healthcheck-%s.%s' % (hashlib.sha1(name.encode()).hexdigest(), suffix))
+
+    def get(self, name):
+        try:
+            with self.get_path(name, 'json').open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, name, record):
+        fd, temporary_path = tempfile.mkstemp(dir=str(self.directory), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(record, f, cls=DjangoJSONEncoder)
+            os.replace(temporary_path, str(self.get_path(name, 'json')))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def acquire(self, name):
+        import fcntl
+
+        lock_file = self.get_path(name, 'lock').open('a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        with self._lock_files_lock:
+            self._lock_files[name] = lock_file
+        return True
+
+    def release(self, name):
+        with self._lock_files_lock:
+            lock_file = self._lock_files.pop(name, None)
+        if lock_file is not None:
+            # closing the file releases the lock
+            lock_file.close()
+
+
+class CacheResultStore(ResultStore):
+    """
+    Shares results between worker processes on any number of hosts through a
+    Django cache, such as Redis or Memcached. A lock expires after `lock_timeout`
+    seconds in case the worker holding it dies.
+    """
+
+    def __init__(self, alias='default', key_prefix='moj_irat.healthcheck', timeout=3600, lock_timeout=60):
+        self.alias = alias
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self._tokens = {}
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+
+        return caches[self.alias]
+
+    def get_key(self, name, suffix):
+        return '%s.%s.%s' % (self.key_prefix, hashlib.sha1(name.encode()).hexdigest(), suffix)
+
+    def get(self, name):
+        return self.cache.get(self.get_key(name, 'result'))
+
+    def set(self, name, record):
+        self.cache.set(self.get_key(name, 'result'), record, timeout=self.timeout)
+
+    def acquire(self, name):
+        token = uuid.uuid4().hex
+        if not self.cache.add(self.get_key(name, 'lock'), token, timeout=self.lock_timeout):
+            return False
+        self._tokens[name] = token
+        return True
+
+    def release(self, name):
+        token = self._tokens.pop(name, None)
+        key = self.get_key(name, 'lock')
+        # the lock may have expired and been taken by another worker
+        if token is not None and self.cache.get(key) == token:
+            self.cache.delete(key)
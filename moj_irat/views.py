@@ -1,9 +1,71 @@
+import hashlib
+import json
 import os
+import re
+import threading
 
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
-from django.http.response import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http.response import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.text import compress_string
 from django.views.generic import View
 
+try:
+    import orjson
+except ImportError:  # optional, installed with django-moj-irat[fast-json]
+    orjson = None
+
+django_json_encoder = DjangoJSONEncoder()
+accepts_gzip = re.compile(r'\bgzip\b')
+
+# parts of healthcheck results that change on every run and are left out of ETags
+VOLATILE_KEYS = frozenset(['age', 'cached_at', 'duration_ms', 'history', 'last_attempt', 'rate_limited'])
+
+
+def dumps(data, sort_keys=False):
+    """
+    Encodes data as JSON bytes, using orjson if it is installed
+    unless settings.HEALTHCHECK_FAST_JSON is False
+    """
+    if orjson is not None and getattr(settings, 'HEALTHCHECK_FAST_JSON', True):
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(data, default=django_json_encoder.default, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers too large for orjson
+            pass
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'), sort_keys=sort_keys).encode()
+
+
+def without_volatile_keys(result):
+    """
+    Returns a healthcheck result without the keys that change on every run,
+    keeping values such as embedded JSON responses as they are
+    """
+    result = {key: value for key, value in result.items() if key not in VOLATILE_KEYS}
+    if isinstance(result.get('responses'), list):
+        result['responses'] = [without_volatile_keys(member) for member in result['responses']]
+    return result
+
+
+def etag_matches(request, etag):
+    """
+    Whether the request's If-None-Match header matches the ETag (using weak comparison)
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    if '*' in etags:
+        return True
+    etag = etag[2:] if etag.startswith('W/') else etag
+    return any((candidate[2:] if candidate.startswith('W/') else candidate) == etag for candidate in etags)
+
 
 class PingJsonView(View):
     """
@@ -22,22 +84,59 @@ class PingJsonView(View):
     version_number_key = None  # Docker container tag
     build_tag_key = None       # Jenkins job name and id
 
+    environment_keys = None  # resolved in `as_view`
+    _cached_responses = {}
+    _cached_responses_lock = threading.Lock()
+
     def __init__(self, **kwargs):
         if not kwargs.get('build_date_key') or not kwargs.get('commit_id_key'):
             raise ImproperlyConfigured('ping.json schema requires build_date_key and '
                                        'commit_id_key to be provided')
         super(PingJsonView, self).__init__(**kwargs)
 
-    def get(self, request):
-        response_data = {
-            attr[:-4]: os.environ.get(getattr(self, attr))
-            for attr in dir(self)
-            if attr.endswith('_key') and getattr(self, attr)
-        }
-        response = JsonResponse(response_data)
-        if not response_data['build_date'] or not response_data['commit_id']:
-            response.status_code = 501
+    @classmethod
+    def as_view(cls, **initkwargs):
+        initkwargs['environment_keys'] = tuple(
+            (attr[:-4], initkwargs.get(attr, getattr(cls, attr)))
+            for attr in dir(cls)
+            if attr.endswith('_key') and initkwargs.get(attr, getattr(cls, attr))
+        )
+        return super(PingJsonView, cls).as_view(**initkwargs)
 
+    @classmethod
+    def clear_cache(cls):
+        """
+        Forgets cached responses so that environment variables are read again
+        """
+        with cls._cached_responses_lock:
+            cls._cached_responses.clear()
+
+    def get_cached_response(self):
+        """
+        Returns the response body, status and ETag, which are only built once
+        as environment variables do not change while the process runs
+        """
+        cached_response = self._cached_responses.get(self.environment_keys)
+        if cached_response is None:
+            response_data = {
+                name: os.environ.get(environment_key)
+                for name, environment_key in self.environment_keys
+            }
+            body = json.dumps(response_data, cls=DjangoJSONEncoder).encode()
+            status = 200 if response_data['build_date'] and response_data['commit_id'] else 501
+            etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+            cached_response = (body, status, etag)
+            with self._cached_responses_lock:
+                self._cached_responses[self.environment_keys] = cached_response
+        return cached_response
+
+    def get(self, request):
+        body, status, etag = self.get_cached_response()
+        if status == 200 and etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json', status=status)
+        response['ETag'] = etag
         response['Access-Control-Allow-Origin'] = '*'
 
         return response
@@ -46,20 +145,150 @@ class PingJsonView(View):
 class HealthcheckView(View):
     """
     View for returning the health status of dependency services for IRaT support
+
+    Usage:
+        urlpatterns = [
+            ...
+            url(r'^healthcheck.json$', HealthcheckView.as_view(), name='healthcheck_json'),
+            url(r'^healthz$', HealthcheckView.as_view(tier='liveness'), name='liveness'),
+            ...
+        ]
+
+    If no tier is set, all healthchecks are run unless one is chosen using the `tier` query parameter.
     """
+    tier = None
+
+    def get_tier(self, request):
+        """
+        Returns the tier of healthchecks to run or raises ValueError if it is not known
+        """
+        from moj_irat.healthchecks import registry
+
+        tier = request.GET.get('tier') or self.tier
+        if tier is not None and tier not in registry.get_tiers():
+            raise ValueError('Unknown healthcheck tier')
+        return tier
 
     def get(self, request):
         from moj_irat.healthchecks import registry
 
+        try:
+            tier = self.get_tier(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return self.make_conditional(request, self.render_healthchecks(registry.run_healthchecks(tier)))
+
+    def render_healthchecks(self, responses):
+        from moj_irat.healthchecks import registry
+
+        history = registry.history if registry.history.size else None
         response_data = {}
-        for response in registry.run_healthchecks():
-            response = response.get_dict()
-            check_name = response.pop('name')
-            response_data[check_name] = response
-        all_passed = all(response['status'] for response in response_data.values())
-        response_data['*'] = dict(status=all_passed)
-
-        response = JsonResponse(response_data)
-        if not all_passed:
-            response.status_code = 500
+        all_passed = True
+        for response in responses:
+            result = response_data[response.name] = response.get_result()
+            if not response.status:
+                all_passed = False
+            if history is not None:
+                summary = history.get_summary(response.name)
+                if summary is not None:
+                    result['history'] = summary
+        response_data['*'] = {'status': all_passed}
+
+        response = HttpResponse(dumps(response_data, sort_keys=True), content_type='application/json',
+                                status=200 if all_passed else 500)
+        response['ETag'] = self.get_etag(response_data)
         return response
+
+    @classmethod
+    def get_etag(cls, response_data):
+        """
+        Returns a weak ETag that only changes when results change, ignoring timings
+        """
+        stable_data = {name: without_volatile_keys(result) for name, result in response_data.items()}
+        stable_body = dumps(stable_data, sort_keys=True)
+        return 'W/"%s"' % hashlib.sha256(stable_body).hexdigest()[:32]
+
+    @classmethod
+    def make_conditional(cls, request, response):
+        """
+        Returns 304 Not Modified if the request's If-None-Match header matches
+        a passing response's ETag, otherwise compresses the response with gzip
+        if it is at least settings.HEALTHCHECK_GZIP_MIN_SIZE bytes long
+        """
+        if response.status_code == 200 and etag_matches(request, response['ETag']):
+            not_modified = HttpResponseNotModified()
+            not_modified['ETag'] = response['ETag']
+            return not_modified
+        gzip_min_size = getattr(settings, 'HEALTHCHECK_GZIP_MIN_SIZE', None)
+        if gzip_min_size is None:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) >= gzip_min_size and \
+                accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            response.content = compress_string(response.content)
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+
+class AsyncHealthcheckView(HealthcheckView):
+    """
+    Async variant of HealthcheckView for ASGI deployments; requires Django 4.1+
+    """
+
+    async def get(self, request):
+        from asgiref.sync import sync_to_async
+
+        from moj_irat.healthchecks import registry
+
+        try:
+            tier = None
+            if request.GET.get('tier') or self.tier:
+                # checking the tier may load the registry
+                tier = await sync_to_async(self.get_tier)(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return self.make_conditional(request, self.render_healthchecks(await registry.arun_healthchecks(tier)))
+
+
+class HealthcheckMetricsView(View):
+    """
+    View for returning healthcheck latency histograms and pass/fail counters
+    in the Prometheus text format. If settings.HEALTHCHECK_METRICS_DIRECTORY
+    is set, metrics saved there by all worker processes are added together;
+    those of exited processes, or older than settings.HEALTHCHECK_METRICS_MAX_AGE
+    seconds, are discarded.
+    """
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def get(self, request):
+        from moj_irat.healthchecks import registry
+        from moj_irat.metrics import merge_snapshots, read_snapshots, render_prometheus
+
+        directory = getattr(settings, 'HEALTHCHECK_METRICS_DIRECTORY', None)
+        if directory:
+            registry.save_metrics()
+            max_age = getattr(settings, 'HEALTHCHECK_METRICS_MAX_AGE', None)
+            snapshot = merge_snapshots(read_snapshots(directory, max_age))
+        else:
+            snapshot = registry.metrics.snapshot()
+        return HttpResponse(render_prometheus(snapshot), content_type=self.content_type)
+
+
+class HealthcheckHistoryView(View):
+    """
+    View for returning recent results of each healthcheck in this process,
+    with their success rate, 95th percentile duration and whether they are
+    flapping. Requires settings.HEALTHCHECK_HISTORY_SIZE to be set.
+
+    Usage:
+        urlpatterns = [
+            ...
+            url(r'^healthcheck/history.json$', HealthcheckHistoryView.as_view(), name='healthcheck_history'),
+            ...
+        ]
+    """
+
+    def get(self, request):
+        from moj_irat.healthchecks import registry
+
+        return HttpResponse(dumps(registry.history.snapshot()), content_type='application/json')
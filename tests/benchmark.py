@@ -0,0 +1,290 @@
+"""
+Benchmarks for the healthcheck and ping views, registry and check types.
+
+Usage:
+    python -m tests.benchmark [--output results.json] [--compare previous-results.json]
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+
+
+def percentile(sorted_timings, fraction):
+    index = max(0, min(len(sorted_timings) - 1, int(round(fraction * len(sorted_timings))) - 1))
+    return sorted_timings[index]
+
+
+def summarise(timings, elapsed):
+    timings = sorted(timings)
+    return {
+        'iterations': len(timings),
+        'throughput_per_second': round(len(timings) / elapsed, 1),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 4),
+        'p50_ms': round(percentile(timings, 0.5) * 1000, 4),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 4),
+    }
+
+
+def measure(func, iterations, warmup=10):
+    """
+    Calls func repeatedly, returning throughput and latency statistics
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - call_started)
+    return summarise(timings, time.perf_counter() - started)
+
+
+def fast_healthcheck():
+    return True
+
+
+def slow_healthcheck():
+    time.sleep(0.001)
+    return True
+
+
+def raising_healthcheck():
+    raise ValueError('error')
+
+
+def make_healthchecks(size):
+    """
+    Returns a mix of fast, slow and raising healthchecks with unique names
+    """
+    kinds = [fast_healthcheck, fast_healthcheck, slow_healthcheck, raising_healthcheck]
+    healthchecks = []
+    for index in range(size):
+        kind = kinds[index % len(kinds)]
+
+        def healthcheck(kind=kind):
+            return kind()
+
+        healthcheck.name = '%s_%s' % (kind.__name__, index)
+        healthchecks.append(healthcheck)
+    return healthchecks
+
+
+def use_healthchecks(healthchecks):
+    from moj_irat.healthchecks import registry
+
+    registry.reset()
+    for healthcheck in healthchecks:
+        registry.register_healthcheck(healthcheck)
+    registry._registry_loaded = True
+
+
+def benchmark_ping_json(client, iterations):
+    from django.urls import reverse
+
+    url = reverse('ping_json')
+    return {'ping_json': measure(lambda: client.get(url), iterations)}
+
+
+def benchmark_healthcheck_json(client, iterations):
+    from django.test.utils import override_settings
+    from django.urls import reverse
+
+    url = reverse('healthcheck_json')
+    results = {}
+    for size in (1, 10, 50):
+        use_healthchecks(make_healthchecks(size))
+        results['healthcheck_json_%s_checks' % size] = measure(lambda: client.get(url), iterations)
+        with override_settings(HEALTHCHECK_MAX_WORKERS=8):
+            results['healthcheck_json_%s_checks_concurrent' % size] = measure(lambda: client.get(url), iterations)
+    return results
+
+
+def benchmark_registry(iterations):
+    from moj_irat.healthchecks import registry
+
+    use_healthchecks(make_healthchecks(50))
+    return {'registry_50_checks': measure(registry.run_healthchecks, iterations)}
+
+
+def benchmark_url_healthchecks(iterations):
+    from moj_irat.healthchecks import JsonUrlHealthcheck, UrlHealthcheck, reset_http_sessions
+    from tests.utils import StubHTTPServer
+
+    results = {}
+    body = json.dumps({'status': 'OK', 'items': list(range(100))}).encode()
+    with StubHTTPServer(body=body, content_type='application/json') as server:
+        reset_http_sessions()
+        healthcheck = UrlHealthcheck(name='url', url=server.url, text_in_response='OK')
+        results['url_healthcheck'] = measure(healthcheck, iterations)
+        healthcheck = UrlHealthcheck(name='url', url=server.url, value_at_json_path=('OK', 'status'))
+        results['url_healthcheck_json_path'] = measure(healthcheck, iterations)
+        healthcheck = JsonUrlHealthcheck(name='url', url=server.url)
+        results['json_url_healthcheck'] = measure(healthcheck, iterations)
+    reset_http_sessions()
+    return results
+
+
+def make_responses(size):
+    """
+    Returns responses of a large registry in which every fourth healthcheck
+    embeds a JSON payload, as JsonUrlHealthcheck does
+    """
+    from moj_irat.healthchecks import HealthcheckResponse
+
+    payload = {
+        'status': 'OK',
+        'components': [{'name': 'component-%s' % index, 'healthy': True, 'latency': index / 10} for index in range(50)],
+    }
+    responses = []
+    for index in range(size):
+        kwargs = {'url': 'https://example.com/%s' % index}
+        if index % 4 == 0:
+            kwargs['response'] = payload
+        response = HealthcheckResponse('healthcheck_%s' % index, True, **kwargs)
+        response.set_duration(0.001)
+        responses.append(response)
+    return responses
+
+
+def legacy_render_healthchecks(responses):
+    """
+    Renders healthcheck.json as before responses were serialised directly, for comparison
+    """
+    from django.http import JsonResponse
+
+    response_data = {}
+    for response in responses:
+        response = response.get_dict()
+        check_name = response.pop('name')
+        response_data[check_name] = response
+    all_passed = all(response['status'] for response in response_data.values())
+    response_data['*'] = dict(status=all_passed)
+    return JsonResponse(response_data)
+
+
+def benchmark_render(iterations):
+    from django.test.utils import override_settings
+
+    from moj_irat.views import HealthcheckView
+
+    view = HealthcheckView()
+    responses = make_responses(200)
+    results = {'render_200_checks_legacy': measure(lambda: legacy_render_healthchecks(responses), iterations)}
+    with override_settings(HEALTHCHECK_FAST_JSON=False):
+        results['render_200_checks_json'] = measure(lambda: view.render_healthchecks(responses), iterations)
+    results['render_200_checks_fast_json'] = measure(lambda: view.render_healthchecks(responses), iterations)
+    return results
+
+
+# run in a new interpreter so that nothing has been imported yet
+STARTUP_SCRIPT = """
+import json, logging, sys, time
+started = time.perf_counter()
+from tests.settings import configure
+configure(**json.loads(sys.argv[1]))
+logging.getLogger('django.request').setLevel(logging.CRITICAL)
+setup_finished = time.perf_counter()
+from django.test import Client
+Client().get('/healthcheck.json')
+print(json.dumps({'setup': setup_finished - started, 'first_request': time.perf_counter() - setup_finished}))
+"""
+
+
+def benchmark_startup(iterations):
+    """
+    Times Django setup and the first healthcheck.json request of new processes,
+    loading healthchecks on first use, when Django starts or lazily by dotted path
+    """
+    variants = {
+        'on_first_request': {},
+        'preloaded': {'HEALTHCHECK_PRELOAD': True},
+        'lazy_import': {'HEALTHCHECK_LAZY_IMPORT': True},
+    }
+    common_settings = {
+        'INSTALLED_APPS': ['moj_irat', 'tests.app'],
+        # moj_irat.healthchecks is always imported, so only a healthcheck in a module of its own is loaded lazily
+        'HEALTHCHECKS': ['moj_irat.healthchecks.DatabaseHealthcheck', 'tests.app.lazy_healthchecks.lazy_healthcheck'],
+    }
+    results = {}
+    for variant, variant_settings in variants.items():
+        arguments = json.dumps(dict(common_settings, **variant_settings))
+        timings = {'setup': [], 'first_request': []}
+        started = time.perf_counter()
+        for _ in range(iterations):
+            output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, arguments],
+                                    check=True, stdout=subprocess.PIPE).stdout
+            for name, timing in json.loads(output.decode()).items():
+                timings[name].append(timing)
+        elapsed = time.perf_counter() - started
+        for name, name_timings in timings.items():
+            results['startup_%s_%s' % (variant, name)] = summarise(name_timings, elapsed)
+    return results
+
+
+def run_benchmarks(iterations):
+    import django
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    client = Client()
+    results = {}
+    with override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False):
+        results.update(benchmark_ping_json(client, iterations))
+        results.update(benchmark_healthcheck_json(client, iterations))
+        results.update(benchmark_registry(iterations))
+        results.update(benchmark_url_healthchecks(iterations))
+        results.update(benchmark_render(iterations))
+    results.update(benchmark_startup(max(1, iterations // 20)))
+    return {
+        'python': platform.python_version(),
+        'django': django.__version__,
+        'iterations': iterations,
+        'benchmarks': results,
+    }
+
+
+def compare_results(previous, current):
+    """
+    Prints the change in p50 latency and throughput of each benchmark
+    """
+    print('%-45s %12s %12s' % ('benchmark', 'p50 change', 'throughput'), file=sys.stderr)
+    for name, result in current['benchmarks'].items():
+        previous_result = previous['benchmarks'].get(name)
+        if not previous_result:
+            continue
+        p50_change = result['p50_ms'] / previous_result['p50_ms'] - 1 if previous_result['p50_ms'] else 0
+        throughput_change = result['throughput_per_second'] / previous_result['throughput_per_second'] - 1
+        print('%-45s %+11.1f%% %+11.1f%%' % (name, p50_change * 100, throughput_change * 100), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark healthcheck views and checks')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='path to save JSON results to, otherwise printed')
+    parser.add_argument('--compare', help='path to JSON results of a previous run')
+    args = parser.parse_args()
+
+    from tests.settings import configure
+
+    configure()
+    # error responses from healthcheck.json would otherwise be logged
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    results = run_benchmarks(args.iterations)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+def configure(**overrides):
+    """
+    Configures Django with settings for running tests and benchmarks
+    """
+    import django
+    from django.conf import settings
+
+    test_settings = dict(
+        DEBUG=True,
+        SECRET_KEY='a' * 24,
+        ROOT_URLCONF='tests.urls',
+        DATABASES={
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        },
+        INSTALLED_APPS=(
+            'moj_irat',
+        ),
+        TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [],
+        }],
+    )
+
+    test_settings.update(overrides)
+    if not settings.configured:
+        settings.configure(**test_settings)
+        django.setup()
@@ -1,14 +1,28 @@
+import asyncio
+import decimal
 import gc
+import gzip
+import json
+import os
 import re
 import sys
+import threading
+import time
+import unittest
 from unittest import mock
 
+from django.db import connections
+from django.test import RequestFactory
 from django.test.utils import override_settings
 from django.urls import reverse
 import responses
 
-from moj_irat.healthchecks import registry
-from tests.utils import TestCase
+from moj_irat.healthchecks import (
+    CacheHealthcheck, DatabaseHealthcheck, HealthcheckResponse, JsonUrlHealthcheck, UrlHealthcheck,
+    TokenBucket, UrlHealthcheckGroup, get_http_session, healthcheck_timeout, registry, reset_http_sessions,
+)
+from moj_irat.views import AsyncHealthcheckView, HealthcheckView, dumps
+from tests.utils import StubHTTPServer, TestCase
 
 
 class HealthcheckTestCase(TestCase):
@@ -55,13 +69,54 @@ class HealthcheckTestCase(TestCase):
         response = self.client.get(reverse('healthcheck_json'))
         self.assertJsonResponse(response, {
             'database': {
-                'status': True
+                'status': True,
+                'duration_ms': mock.ANY,
             },
             '*': {
                 'status': True
             }
         })
 
+    @override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False)
+    def test_invalid_options_ignored(self):
+        def healthcheck():
+            return True
+
+        healthcheck.cache_ttl = '60'
+        healthcheck.timeout = 'soon'
+        healthcheck.rate_limit = None
+        registry.register_healthcheck(healthcheck)
+        response, = registry.run_healthchecks()
+        self.assertTrue(response.status)
+        self.assertNotIn('cached_at', response.kwargs)
+
+    @override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False)
+    def test_option_errors_fail_one_healthcheck(self):
+        def healthcheck():
+            return True
+
+        def other_healthcheck():
+            return True
+
+        registry.register_healthcheck(healthcheck)
+        registry.register_healthcheck(other_healthcheck)
+        get_cache_ttl = registry.get_cache_ttl
+
+        def broken_get_cache_ttl(checked_healthcheck, tier=None):
+            if checked_healthcheck is healthcheck:
+                raise TypeError('broken option')
+            return get_cache_ttl(checked_healthcheck, tier)
+
+        with mock.patch.object(registry, 'get_cache_ttl', side_effect=broken_get_cache_ttl), \
+                self.assertLogs('moj_irat.healthchecks', 'ERROR'):
+            response = self.client.get(reverse('healthcheck_json'))
+        self.assertEqual(response.status_code, 500)
+        data = response.json()
+        self.assertDictEqual(data['healthcheck'], {
+            'status': False, 'exception': 'broken option', 'exception_class': 'TypeError',
+        })
+        self.assertTrue(data['other_healthcheck']['status'])
+
     @override_settings(INSTALLED_APPS=['moj_irat', 'tests.app'],
                        HEALTHCHECKS=[])
     def test_healthcheck_view_with_responses(self):
@@ -82,22 +137,27 @@ class HealthcheckTestCase(TestCase):
 
         self.assertJsonResponse(response, {
             'passing_bool_healthcheck': {
-                'status': True
+                'status': True,
+                'duration_ms': mock.ANY,
             },
             'failing_bool': {
-                'status': False
+                'status': False,
+                'duration_ms': mock.ANY,
             },
             'error_healthcheck': {
                 'status': False,
                 'exception': 'error',
                 'exception_class': 'ValueError',
+                'duration_ms': mock.ANY,
             },
             'class': {
                 'status': True,
+                'duration_ms': mock.ANY,
             },
             'class_extra': {
                 'status': True,
                 'extra': 'extra message',
+                'duration_ms': mock.ANY,
             },
             '*': {
                 'status': False
@@ -149,3 +209,1660 @@ class HealthcheckTestCase(TestCase):
         self.assertEqual(response.name, 'url')
         self.assertEqual(response.kwargs['url'], url)
         self.assertEqual(response.kwargs['response'], json_response)
+
+
+class ConcurrentHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        registry._registry_loaded = True
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def tearDown(self):
+        registry.reset()
+
+    def make_slow_healthcheck(self, name, timeout=None):
+        def slow_healthcheck():
+            self.release.wait(5)
+            return True
+
+        slow_healthcheck.name = name
+        if timeout is not None:
+            slow_healthcheck.timeout = timeout
+        return slow_healthcheck
+
+    def make_healthcheck(self, name, status=True):
+        def healthcheck():
+            return HealthcheckResponse(name, status)
+
+        healthcheck.__name__ = name
+        return healthcheck
+
+    @override_settings(HEALTHCHECK_MAX_WORKERS=4)
+    def test_concurrent_healthchecks_keep_registration_order(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def make_waiting_healthcheck(name):
+            def healthcheck():
+                barrier.wait()
+                return True
+
+            healthcheck.name = name
+            return healthcheck
+
+        for name in ('a', 'b', 'c'):
+            registry.register_healthcheck(make_waiting_healthcheck(name))
+        responses = registry.run_healthchecks()
+        self.assertListEqual([response.name for response in responses], ['a', 'b', 'c'])
+        self.assertTrue(all(response.status for response in responses))
+
+    @override_settings(HEALTHCHECK_MAX_WORKERS=4, HEALTHCHECK_DEADLINE=0.1)
+    def test_concurrent_healthchecks_time_out_at_global_deadline(self):
+        registry.register_healthcheck(self.make_healthcheck('fast'))
+        registry.register_healthcheck(self.make_slow_healthcheck('slow'))
+
+        started = time.monotonic()
+        responses = registry.run_healthchecks()
+        self.assertLess(time.monotonic() - started, 2)
+
+        fast, slow = responses
+        self.assertTrue(fast.status)
+        self.assertFalse(slow.status)
+        self.assertEqual(slow.name, 'slow')
+        self.assertDictEqual(slow.kwargs, {'error': 'Timed out', 'timed_out': True})
+
+    @override_settings(HEALTHCHECK_MAX_WORKERS=4)
+    def test_concurrent_healthchecks_time_out_at_own_timeout(self):
+        registry.register_healthcheck(self.make_slow_healthcheck('slow', timeout=0.1))
+
+        response, = registry.run_healthchecks()
+        self.assertFalse(response.status)
+        self.assertTrue(response.kwargs['timed_out'])
+
+    @override_settings(HEALTHCHECK_MAX_WORKERS=2, HEALTHCHECK_DEADLINE=0.1)
+    def test_abandoned_healthchecks_hold_one_pool_thread(self):
+        registry.register_healthcheck(self.make_slow_healthcheck('slow'))
+        registry.register_healthcheck(self.make_healthcheck('fast'))
+
+        for _ in range(3):
+            slow, fast = registry.run_healthchecks()
+            self.assertFalse(slow.status)
+            self.assertTrue(fast.status)
+
+    @override_settings(HEALTHCHECK_MAX_WORKERS=2, HEALTHCHECK_TIERS={'readiness': {'deadline': 0.2}})
+    def test_overlapping_tiered_runs_share_pooled_runs(self):
+        started = threading.Semaphore(0)
+
+        def make_blocking_healthcheck(name):
+            def healthcheck():
+                started.release()
+                self.release.wait(5)
+                return True
+
+            healthcheck.name = name
+            return healthcheck
+
+        registry.register_healthcheck(make_blocking_healthcheck('first'))
+        registry.register_healthcheck(make_blocking_healthcheck('second'))
+        registry.register_healthcheck(self.make_healthcheck('queued'))
+        results = []
+        untiered_run = threading.Thread(target=lambda: results.append(registry.run_healthchecks()))
+        untiered_run.start()
+        self.assertTrue(started.acquire(timeout=5))
+        self.assertTrue(started.acquire(timeout=5))
+
+        # the queued healthcheck's run is shared with the untiered run, which is still waiting for it
+        tiered_responses = registry.run_healthchecks('readiness')
+        self.assertTrue(all(response.kwargs.get('timed_out') for response in tiered_responses))
+        self.release.set()
+        untiered_run.join(5)
+        self.assertTrue(all(response.status for response in results[0]))
+
+    @override_settings(HEALTHCHECK_MAX_WORKERS=2)
+    def test_pooled_healthchecks_close_old_connections(self):
+        threads = []
+
+        def healthcheck():
+            threads.append(threading.current_thread())
+            return True
+
+        registry.register_healthcheck(healthcheck)
+        with mock.patch('django.db.close_old_connections') as close_old_connections:
+            registry.run_healthchecks()
+        self.assertEqual(close_old_connections.call_count, 2)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    @override_settings(HEALTHCHECK_DEADLINE=0)
+    def test_sequential_healthchecks_not_started_after_deadline(self):
+        registry.register_healthcheck(self.make_healthcheck('first'))
+
+        response, = registry.run_healthchecks()
+        self.assertFalse(response.status)
+        self.assertTrue(response.kwargs['timed_out'])
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+class ForkedHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        registry._registry_loaded = True
+
+        def healthcheck():
+            return True
+
+        registry.register_healthcheck(healthcheck)
+
+    def tearDown(self):
+        registry.reset()
+
+    def run_in_child(self, run):
+        """
+        Runs a function in a forked process, returning the statuses of the responses it returns
+        """
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            statuses = None
+            try:
+                statuses = [response.status for response in run()]
+            finally:
+                os.write(write_fd, json.dumps(statuses).encode())
+                os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            output = f.read()
+        os.waitpid(pid, 0)
+        return json.loads(output)
+
+    @override_settings(HEALTHCHECK_MAX_WORKERS=2, HEALTHCHECK_DEADLINE=1)
+    def test_concurrent_runs_in_forked_child(self):
+        self.assertTrue(all(response.status for response in registry.run_healthchecks()))
+        self.assertListEqual(self.run_in_child(registry.run_healthchecks), [True])
+
+    @override_settings(HEALTHCHECK_SCHEDULER=True, HEALTHCHECK_MAX_WORKERS=2, HEALTHCHECK_SCHEDULER_INTERVAL=60)
+    def test_scheduler_in_forked_child(self):
+        registry.scheduler.start()
+        while 'healthcheck' not in registry.scheduler._results:
+            time.sleep(0.001)
+
+        def wait_for_scheduler():
+            deadline = time.monotonic() + 5
+            while True:
+                responses = registry.run_healthchecks()
+                if responses[0].status or time.monotonic() > deadline:
+                    return responses
+                time.sleep(0.01)
+
+        self.assertListEqual(self.run_in_child(wait_for_scheduler), [True])
+
+
+class CachedHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        registry._registry_loaded = True
+        self.calls = []
+
+        def counting_healthcheck():
+            self.calls.append(threading.current_thread())
+            return len(self.calls) == 1
+
+        counting_healthcheck.name = 'counting'
+        self.healthcheck = counting_healthcheck
+        registry.register_healthcheck(counting_healthcheck)
+
+    def tearDown(self):
+        registry.reset()
+
+    def expire_cache(self):
+        registry._cache['counting'].cached_at_monotonic -= 3600
+
+    def test_results_not_cached_by_default(self):
+        registry.run_healthchecks()
+        registry.run_healthchecks()
+        self.assertEqual(len(self.calls), 2)
+
+    @override_settings(HEALTHCHECK_CACHE_TTL=60)
+    def test_results_cached_within_ttl(self):
+        first, = registry.run_healthchecks()
+        second, = registry.run_healthchecks()
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(second.status)
+        self.assertEqual(first.kwargs['cached_at'], second.kwargs['cached_at'])
+        self.assertGreaterEqual(second.kwargs['age'], 0)
+        self.assertIn('cached_at', second.get_dict())
+
+    def test_results_cached_with_per_check_ttl(self):
+        self.healthcheck.cache_ttl = 60
+        registry.run_healthchecks()
+        registry.run_healthchecks()
+        self.assertEqual(len(self.calls), 1)
+
+    @override_settings(HEALTHCHECK_CACHE_TTL=60)
+    def test_per_check_ttl_can_disable_caching(self):
+        self.healthcheck.cache_ttl = 0
+        registry.run_healthchecks()
+        response, = registry.run_healthchecks()
+        self.assertEqual(len(self.calls), 2)
+        self.assertNotIn('cached_at', response.kwargs)
+
+    @override_settings(HEALTHCHECK_CACHE_TTL=60)
+    def test_expired_result_served_stale_while_refreshing(self):
+        registry.run_healthchecks()
+        self.expire_cache()
+
+        with mock.patch('threading.Thread.start', autospec=True) as mocked_start:
+            stale, = registry.run_healthchecks()
+            registry.run_healthchecks()
+        self.assertTrue(stale.status)
+        self.assertGreaterEqual(stale.kwargs['age'], 3600)
+        self.assertEqual(mocked_start.call_count, 1, 'only one refresh should be started')
+
+        refresh_thread = mocked_start.call_args[0][0]
+        refresh_thread.run()
+        self.assertEqual(len(self.calls), 2)
+        refreshed, = registry.run_healthchecks()
+        self.assertFalse(refreshed.status)
+        self.assertLess(refreshed.kwargs['age'], 60)
+        self.assertSetEqual(registry._refreshing, set())
+
+
+class CoalescedHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        registry._registry_loaded = True
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.calls = 0
+
+        def blocking_healthcheck():
+            self.calls += 1
+            self.started.set()
+            self.release.wait(5)
+            return True
+
+        registry.register_healthcheck(blocking_healthcheck)
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_concurrent_callers_share_one_run(self):
+        results = []
+
+        def run():
+            results.append(registry.run_healthchecks())
+
+        leader = threading.Thread(target=run)
+        leader.start()
+        self.assertTrue(self.started.wait(5))
+        followers = [threading.Thread(target=run) for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        while len(registry._runs['*'].finished._cond._waiters) < 3:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(results), 4)
+        for run_responses in results:
+            self.assertListEqual([response.status for response in run_responses], [True])
+        self.assertIs(results[0][0], results[1][0])
+        self.assertIsNot(results[0], results[1])
+        self.assertDictEqual(registry._runs, {})
+
+    def test_sequential_callers_start_new_runs(self):
+        self.release.set()
+        registry.run_healthchecks()
+        registry.run_healthchecks()
+        self.assertEqual(self.calls, 2)
+
+    def test_failed_run_is_cleared(self):
+        run = mock.Mock(side_effect=RuntimeError('failed'))
+        with self.assertRaises(RuntimeError):
+            registry.coalesce_run('*', run)
+        self.assertDictEqual(registry._runs, {})
+
+
+@override_settings(HEALTHCHECK_SCHEDULER=True, HEALTHCHECK_SCHEDULER_INTERVAL=60)
+class ScheduledHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        registry._registry_loaded = True
+        self.checked = threading.Event()
+        self.calls = []
+
+        def scheduled_healthcheck():
+            self.calls.append(threading.current_thread().name)
+            self.checked.set()
+            return True
+
+        scheduled_healthcheck.name = 'scheduled'
+        registry.register_healthcheck(scheduled_healthcheck)
+
+    def tearDown(self):
+        registry.reset()
+
+    def wait_for_first_run(self):
+        self.assertTrue(self.checked.wait(5))
+        while 'scheduled' not in registry.scheduler._results:
+            time.sleep(0.001)
+
+    def test_scheduler_started_on_first_use(self):
+        self.assertFalse(registry.scheduler.running)
+        response, = registry.run_healthchecks()
+        self.assertTrue(registry.scheduler.running)
+        if not response.status:
+            self.assertEqual(response.kwargs['error'], 'Not checked yet')
+
+        self.wait_for_first_run()
+        response, = registry.run_healthchecks()
+        self.assertTrue(response.status)
+        self.assertListEqual(self.calls, ['healthcheck-scheduler'])
+
+    def test_scheduler_results_served_without_running_healthchecks(self):
+        registry.scheduler.start()
+        self.wait_for_first_run()
+        for _ in range(5):
+            response, = registry.run_healthchecks()
+            self.assertTrue(response.status)
+        self.assertEqual(len(self.calls), 1)
+
+    @override_settings(HEALTHCHECK_MAX_AGE=10)
+    def test_old_scheduler_results_fail(self):
+        registry.scheduler.start()
+        self.wait_for_first_run()
+        registry.scheduler._results['scheduled'].cached_at_monotonic -= 11
+
+        response, = registry.run_healthchecks()
+        self.assertFalse(response.status)
+        self.assertTrue(response.kwargs['stale'])
+
+    def test_scheduler_stops_cleanly(self):
+        registry.scheduler.start()
+        thread = registry.scheduler._thread
+        registry.scheduler.stop()
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(registry.scheduler.running)
+
+    def test_scheduler_restarts_after_fork(self):
+        registry.scheduler.start()
+        self.wait_for_first_run()
+        registry.scheduler._after_fork()
+        self.assertFalse(registry.scheduler.running)
+        self.assertDictEqual(registry.scheduler._results, {})
+
+    def test_scheduler_runs_due_healthchecks_with_jitter(self):
+        next_runs = {}
+        with mock.patch('random.uniform', return_value=0.1):
+            delay = registry.scheduler.run_due_healthchecks(next_runs)
+        self.assertAlmostEqual(delay, 66, delta=1)
+        delay = registry.scheduler.run_due_healthchecks(next_runs)
+        self.assertEqual(len(self.calls), 1)
+        self.assertGreater(delay, 60)
+
+
+class AsyncHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        registry._registry_loaded = True
+
+    def tearDown(self):
+        registry.reset()
+
+    def register_healthchecks(self):
+        async def async_healthcheck():
+            await asyncio.sleep(0)
+            return True
+
+        class AsyncClassHealthcheck:
+            async def __call__(self):
+                return HealthcheckResponse('async_class', True, extra='extra message')
+
+        async def async_error_healthcheck():
+            raise ValueError('error')
+
+        def sync_healthcheck():
+            return False
+
+        for healthcheck in (async_healthcheck, AsyncClassHealthcheck, async_error_healthcheck, sync_healthcheck):
+            registry.register_healthcheck(healthcheck)
+
+    def assertResponses(self, responses):  # noqa: N802
+        self.assertListEqual([response.get_dict() for response in responses], [
+            {'name': 'async_healthcheck', 'status': True, 'duration_ms': mock.ANY},
+            {'name': 'async_class', 'status': True, 'extra': 'extra message', 'duration_ms': mock.ANY},
+            {'name': 'async_error_healthcheck', 'status': False,
+             'exception': 'error', 'exception_class': 'ValueError', 'duration_ms': mock.ANY},
+            {'name': 'sync_healthcheck', 'status': False, 'duration_ms': mock.ANY},
+        ])
+
+    def test_async_healthchecks(self):
+        self.register_healthchecks()
+        self.assertResponses(asyncio.run(registry.arun_healthchecks()))
+
+    def test_async_healthchecks_run_synchronously(self):
+        self.register_healthchecks()
+        self.assertResponses(registry.run_healthchecks())
+
+    def test_async_healthchecks_run_together(self):
+        async def waiting_healthcheck():
+            await asyncio.wait_for(barrier.wait(), 5)
+            return True
+
+        class Barrier:
+            def __init__(self, parties):
+                self.parties = parties
+                self.arrived = 0
+                self.event = asyncio.Event()
+
+            async def wait(self):
+                self.arrived += 1
+                if self.arrived == self.parties:
+                    self.event.set()
+                await self.event.wait()
+
+        async def run_with_barrier():
+            nonlocal barrier
+            barrier = Barrier(3)
+            return await registry.arun_healthchecks()
+
+        barrier = None
+        for _ in range(3):
+            registry.register_healthcheck(waiting_healthcheck)
+        responses = asyncio.run(run_with_barrier())
+        self.assertTrue(all(response.status for response in responses))
+
+    @override_settings(HEALTHCHECK_DEADLINE=0.05)
+    def test_async_healthchecks_time_out(self):
+        async def slow_healthcheck():
+            await asyncio.sleep(5)
+            return True
+
+        slow_healthcheck.name = 'slow'
+        registry.register_healthcheck(slow_healthcheck)
+
+        response, = asyncio.run(registry.arun_healthchecks())
+        self.assertDictEqual(response.get_dict(), {
+            'name': 'slow', 'status': False, 'error': 'Timed out', 'timed_out': True, 'duration_ms': mock.ANY,
+        })
+        self.assertGreaterEqual(response.duration_ms, 50)
+
+    @override_settings(HEALTHCHECK_DEADLINE=0.05)
+    def test_hung_sync_healthchecks_reused_in_async_runs(self):
+        calls = []
+        released = threading.Event()
+        self.addCleanup(released.set)
+
+        def hung_healthcheck():
+            calls.append(1)
+            released.wait(5)
+            return True
+
+        def healthy_healthcheck():
+            return True
+
+        registry.register_healthcheck(hung_healthcheck)
+        registry.register_healthcheck(healthy_healthcheck)
+        for _ in range(5):
+            hung, healthy = asyncio.run(registry.arun_healthchecks())
+            self.assertTrue(hung.kwargs.get('timed_out'))
+            self.assertTrue(healthy.status)
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_async_runs_are_coalesced(self):
+        calls = []
+
+        async def counting_healthcheck():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return True
+
+        registry.register_healthcheck(counting_healthcheck)
+
+        async def run():
+            return await asyncio.gather(*(registry.arun_healthchecks() for _ in range(5)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        self.assertDictEqual(registry._async_runs, {})
+
+    def test_async_healthchecks_cached(self):
+        calls = []
+
+        async def cached_healthcheck():
+            calls.append(1)
+            return True
+
+        cached_healthcheck.cache_ttl = 60
+        registry.register_healthcheck(cached_healthcheck)
+        responses = [asyncio.run(registry.arun_healthchecks())[0] for _ in range(3)]
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(response.status for response in responses))
+        self.assertIn('cached_at', responses[-1].kwargs)
+
+    @override_settings(HEALTHCHECK_CACHE_TTL=0.05)
+    def test_expired_async_healthchecks_refreshed_in_background(self):
+        calls = []
+        refreshed = threading.Event()
+
+        async def cached_healthcheck():
+            calls.append(1)
+            if len(calls) > 1:
+                refreshed.set()
+            return True
+
+        registry.register_healthcheck(cached_healthcheck)
+        asyncio.run(registry.arun_healthchecks())
+        time.sleep(0.06)
+        response, = asyncio.run(registry.arun_healthchecks())
+        self.assertGreaterEqual(response.kwargs['age'], 0.05)
+        self.assertTrue(refreshed.wait(5))
+
+    def test_async_healthcheck_view(self):
+        self.register_healthchecks()
+        request = RequestFactory().get('/healthcheck.json')
+        response = asyncio.run(AsyncHealthcheckView.as_view()(request))
+        self.assertEqual(response.status_code, 500)
+        self.assertDictEqual(json.loads(response.content.decode('utf-8')), {
+            'async_healthcheck': {'status': True, 'duration_ms': mock.ANY},
+            'async_class': {'status': True, 'extra': 'extra message', 'duration_ms': mock.ANY},
+            'async_error_healthcheck': {'status': False, 'exception': 'error', 'exception_class': 'ValueError',
+                                        'duration_ms': mock.ANY},
+            'sync_healthcheck': {'status': False, 'duration_ms': mock.ANY},
+            '*': {'status': False},
+        })
+
+
+class PooledUrlHealthcheckTestCase(TestCase):
+    def setUp(self):
+        reset_http_sessions()
+        self.addCleanup(reset_http_sessions)
+
+    def test_url_healthchecks_reuse_connections(self):
+        with StubHTTPServer() as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url, text_in_response='OK')
+            other_healthcheck = UrlHealthcheck(name='other_url', url=server.url + 'other/')
+            responses = [healthcheck(), other_healthcheck(), healthcheck()]
+
+        self.assertTrue(all(response.status for response in responses))
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(len(server.connections), 1)
+
+    @override_settings(HEALTHCHECK_HTTP_KEEP_ALIVE=False)
+    def test_url_healthchecks_without_keep_alive(self):
+        with StubHTTPServer() as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url)
+            healthcheck()
+            healthcheck()
+
+        self.assertEqual(len(server.connections), 2)
+
+    @override_settings(HEALTHCHECK_HTTP_POOL_SIZE=3, HEALTHCHECK_HTTP_RETRIES=2)
+    def test_shared_session_configured_from_settings(self):
+        session = get_http_session()
+        self.assertIs(get_http_session(), session)
+        adapter = session.get_adapter('https://example.com/')
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertEqual(adapter.max_retries.total, 2)
+
+    @responses.activate
+    def test_cookies_not_kept(self):
+        responses.add(responses.GET, 'http://www.example.com/', body='OK',
+                      headers={'Set-Cookie': 'session=abc; Path=/'})
+        healthcheck = UrlHealthcheck(name='url', url='http://www.example.com/')
+        healthcheck()
+        healthcheck()
+        self.assertEqual(len(get_http_session().cookies), 0)
+        self.assertNotIn('Cookie', responses.calls[1].request.headers)
+
+    def test_response_internals_not_used(self):
+        url_response = mock.Mock(spec=['status_code', 'headers', 'encoding', 'iter_content', 'close'],
+                                 status_code=200, headers={}, encoding=None)
+        url_response.iter_content.return_value = iter([b'{"status": ', b'"OK"}'])
+        session = mock.Mock()
+        session.get.return_value = url_response
+        healthcheck = JsonUrlHealthcheck(name='url', url='http://www.example.com/', session=session,
+                                         value_at_json_path=('OK', 'status'))
+        response = healthcheck()
+        self.assertTrue(response.status)
+        self.assertDictEqual(response.kwargs['response'], {'status': 'OK'})
+        url_response.iter_content.assert_called_once()
+        url_response.close.assert_called_once()
+
+    def test_custom_session(self):
+        session = mock.Mock()
+        session.get.return_value = mock.Mock(status_code=200, headers={})
+        healthcheck = UrlHealthcheck(name='url', url='http://www.example.com/', session=session)
+        self.assertTrue(healthcheck().status)
+        session.get.assert_called_once()
+
+
+class UrlHealthcheckGroupTestCase(TestCase):
+    def setUp(self):
+        reset_http_sessions()
+        self.addCleanup(reset_http_sessions)
+        registry.reset()
+        registry._registry_loaded = True
+        self.addCleanup(registry.reset)
+
+    def test_urls_checked_concurrently(self):
+        with StubHTTPServer(delay=0.2) as server:
+            group = UrlHealthcheckGroup(name='urls', urls=[
+                {'name': 'url_%s' % index, 'url': server.url + str(index)} for index in range(4)
+            ])
+            self.addCleanup(group.teardown)
+            started = time.monotonic()
+            responses = group()
+            duration = time.monotonic() - started
+
+        self.assertListEqual([response.name for response in responses], ['url_0', 'url_1', 'url_2', 'url_3'])
+        self.assertTrue(all(response.status for response in responses))
+        self.assertLess(duration, 0.6)
+        self.assertEqual(len(server.requests), 4)
+
+    def test_connections_reused(self):
+        with StubHTTPServer() as server:
+            group = UrlHealthcheckGroup(name='urls', max_workers=2, urls=[
+                {'name': 'url_%s' % index, 'url': server.url + str(index)} for index in range(3)
+            ])
+            self.addCleanup(group.teardown)
+            for _ in range(3):
+                group()
+
+        self.assertEqual(len(server.requests), 9)
+        self.assertLessEqual(len(server.connections), 2)
+
+    def test_deadline_fails_slow_urls(self):
+        with StubHTTPServer() as server, StubHTTPServer(delay=1) as slow_server:
+            fast_healthcheck = UrlHealthcheck(name='fast', url=server.url)
+            group = UrlHealthcheckGroup(name='urls', deadline=0.2, urls=[
+                fast_healthcheck,
+                {'name': 'slow', 'url': slow_server.url, 'timeout': 5},
+            ])
+            self.addCleanup(group.teardown)
+            self.assertEqual(group.healthchecks[0].timeout, 0.2)
+            self.assertEqual(fast_healthcheck.timeout, 5)
+            self.assertEqual(group.healthchecks[1].timeout, 0.2)
+            started = time.monotonic()
+            fast_response, slow_response = group()
+            duration = time.monotonic() - started
+
+        self.assertLess(duration, 0.9)
+        self.assertTrue(fast_response.status)
+        self.assertFalse(slow_response.status)
+        self.assertEqual(slow_response.name, 'slow')
+
+    def test_registry_reports_each_url(self):
+        with StubHTTPServer() as server, StubHTTPServer(status=500) as failing_server:
+            group = UrlHealthcheckGroup(name='urls', urls=[
+                {'name': 'working', 'url': server.url},
+                {'name': 'failing', 'url': failing_server.url},
+            ])
+            registry.register_healthcheck(group)
+            self.addCleanup(group.teardown)
+            responses = registry.run_healthchecks()
+            response = self.client.get(reverse('healthcheck_json'))
+
+        self.assertListEqual([(response.name, response.status) for response in responses],
+                             [('working', True), ('failing', False)])
+        data = json.loads(response.content)
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue(data['working']['status'])
+        self.assertFalse(data['failing']['status'])
+        self.assertNotIn('urls', data)
+
+    @override_settings(HEALTHCHECK_CACHE_TTL=60)
+    def test_cached_group_responses(self):
+        with StubHTTPServer() as server:
+            group = UrlHealthcheckGroup(name='urls', urls=[
+                {'name': 'url_%s' % index, 'url': server.url} for index in range(2)
+            ])
+            registry.register_healthcheck(group)
+            self.addCleanup(group.teardown)
+            registry.run_healthchecks()
+            responses = registry.run_healthchecks()
+
+        self.assertEqual(len(server.requests), 2)
+        self.assertListEqual([response.name for response in responses], ['url_0', 'url_1'])
+        self.assertTrue(all('age' in response.kwargs for response in responses))
+
+
+class StreamedUrlHealthcheckTestCase(TestCase):
+    def setUp(self):
+        reset_http_sessions()
+        self.addCleanup(reset_http_sessions)
+
+    def test_text_found_across_chunks(self):
+        with StubHTTPServer(body=b'abcdefghij' * 10, chunk_size=4) as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url, text_in_response='ghijab')
+            healthcheck.chunk_size = 4
+            response = healthcheck()
+        self.assertTrue(response.status)
+
+    def test_text_found_across_chunks_shorter_than_it(self):
+        with StubHTTPServer(body=b'abcdef', chunk_size=2) as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url, text_in_response='abcdef')
+            healthcheck.chunk_size = 2
+            response = healthcheck()
+        self.assertTrue(response.status)
+
+    def test_text_not_found_across_chunks(self):
+        with StubHTTPServer(body=b'abcdefghij' * 10, chunk_size=4) as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url, text_in_response='jihg')
+            healthcheck.chunk_size = 4
+            response = healthcheck()
+        self.assertFalse(response.status)
+        self.assertEqual(response.kwargs['error'], 'Response text did not contain jihg')
+
+    def test_text_with_characters_split_across_chunks(self):
+        with StubHTTPServer(body='état: ✓ prêt'.encode(), content_type='text/plain; charset=utf-8') as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url, text_in_response='✓ prêt')
+            healthcheck.chunk_size = 3
+            response = healthcheck()
+        self.assertTrue(response.status)
+
+    def test_text_not_encodable_in_response_charset(self):
+        body = 'état: prêt'.encode('iso-8859-1')
+        with StubHTTPServer(body=body, content_type='text/plain; charset=iso-8859-1') as server:
+            found = UrlHealthcheck(name='url', url=server.url, text_in_response='prêt')()
+            not_found = UrlHealthcheck(name='url', url=server.url, text_in_response='✓')()
+        self.assertTrue(found.status)
+        self.assertFalse(not_found.status)
+        self.assertEqual(not_found.kwargs['error'], 'Response text did not contain ✓')
+
+    def test_text_found_before_size_limit_in_large_body(self):
+        with StubHTTPServer(body=b'status: OK\n' + b'x' * 100000, chunk_size=1024) as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url, text_in_response='OK',
+                                         max_response_size=2048)
+            response = healthcheck()
+        self.assertTrue(response.status)
+
+    def test_text_search_stops_at_size_limit(self):
+        with StubHTTPServer(body=b'x' * 100000 + b'OK', chunk_size=1024) as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url, text_in_response='OK',
+                                         max_response_size=2048)
+            response = healthcheck()
+        self.assertFalse(response.status)
+        self.assertEqual(response.kwargs['error'], 'Response was larger than 2048 bytes')
+
+    @override_settings(HEALTHCHECK_MAX_RESPONSE_SIZE=10)
+    def test_declared_content_length_over_size_limit(self):
+        with StubHTTPServer(body=b'{"status": "OK"}') as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url, value_at_json_path=('OK', 'status'))
+            response = healthcheck()
+        self.assertFalse(response.status)
+        self.assertEqual(response.kwargs['error'], 'Response was larger than 10 bytes')
+
+    def test_json_path_read_from_streamed_body(self):
+        with StubHTTPServer(body=b'{"status": "OK"}', chunk_size=4) as server:
+            healthcheck = UrlHealthcheck(name='url', url=server.url, text_in_response='status',
+                                         value_at_json_path=('OK', 'status'))
+            response = healthcheck()
+        self.assertTrue(response.status)
+
+    def test_large_json_response_not_included(self):
+        body = json.dumps({'items': list(range(1000))}).encode()
+        with StubHTTPServer(body=body, content_type='application/json') as server:
+            healthcheck = JsonUrlHealthcheck(name='url', url=server.url, max_embedded_size=100)
+            response = healthcheck()
+        self.assertTrue(response.status)
+        self.assertEqual(response.kwargs['response'], 'JSON response too large to include (%s bytes)' % len(body))
+
+    def test_small_json_response_included(self):
+        with StubHTTPServer(body=b'{"status": "OK"}', content_type='application/json') as server:
+            healthcheck = JsonUrlHealthcheck(name='url', url=server.url, max_embedded_size=100)
+            response = healthcheck()
+        self.assertTrue(response.status)
+        self.assertEqual(response.kwargs['response'], {'status': 'OK'})
+
+
+@override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False)
+class TieredHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.calls = []
+
+        def make_healthcheck(name):
+            def healthcheck():
+                self.calls.append(name)
+                return True
+
+            healthcheck.__name__ = name
+            return healthcheck
+
+        self.process_healthcheck = make_healthcheck('process')
+        self.database_healthcheck = make_healthcheck('database')
+        self.api_healthcheck = make_healthcheck('api')
+        self.api_healthcheck.tags = ['deep']
+        registry.register_healthcheck(self.process_healthcheck, tags=['liveness', 'readiness'])
+        registry.register_healthcheck(self.database_healthcheck)
+        registry.register_healthcheck(self.api_healthcheck)
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_healthchecks_selected_by_tier(self):
+        self.assertListEqual([response.name for response in registry.run_healthchecks('liveness')], ['process'])
+        self.assertListEqual([response.name for response in registry.run_healthchecks('readiness')],
+                             ['process', 'database'])
+        self.assertListEqual([response.name for response in registry.run_healthchecks('deep')], ['api'])
+        self.assertListEqual([response.name for response in registry.run_healthchecks()],
+                             ['process', 'database', 'api'])
+
+    def test_tiers(self):
+        self.assertSetEqual(registry.get_tiers(), {'liveness', 'readiness', 'deep'})
+
+    @override_settings(HEALTHCHECK_CACHE_TTL=0, HEALTHCHECK_TIERS={'readiness': {'cache_ttl': 60}})
+    def test_tier_settings(self):
+        registry.run_healthchecks('readiness')
+        registry.run_healthchecks('readiness')
+        registry.run_healthchecks()
+        self.assertListEqual(self.calls, ['process', 'database', 'process', 'database', 'api'])
+        self.assertEqual(registry.get_setting('deadline', 'readiness', 5), 5)
+        self.assertEqual(registry.get_setting('cache_ttl', 'liveness'), 0)
+
+    def test_liveness_tier_view(self):
+        response = self.client.get(reverse('healthcheck_json'), {'tier': 'liveness'})
+        self.assertJsonResponse(response, {
+            'process': {'status': True, 'duration_ms': mock.ANY},
+            '*': {'status': True},
+        })
+        self.assertListEqual(self.calls, ['process'])
+
+    def test_view_with_tier_option(self):
+        request = RequestFactory().get('/healthz')
+        response = HealthcheckView.as_view(tier='deep')(request)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['api']['status'], True)
+        self.assertListEqual(self.calls, ['api'])
+
+    def test_unknown_tier(self):
+        response = self.client.get(reverse('healthcheck_json'), {'tier': 'livenes'})
+        self.assertJsonResponse(response, {'error': 'Unknown healthcheck tier'}, status_code=400)
+        self.assertListEqual(self.calls, [])
+
+    def test_empty_tier_view(self):
+        registry.reset()
+        registry.register_healthcheck(self.database_healthcheck)
+        response = self.client.get(reverse('healthcheck_json'), {'tier': 'liveness'})
+        self.assertJsonResponse(response, {'*': {'status': True}})
+        self.assertListEqual(self.calls, [])
+
+    def test_async_view_with_tier(self):
+        request = RequestFactory().get('/healthcheck.json', {'tier': 'liveness'})
+        response = asyncio.run(AsyncHealthcheckView.as_view()(request))
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(self.calls, ['process'])
+
+
+class CircuitBreakerHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.calls = []
+        self.healthy = False
+
+        def healthcheck():
+            self.calls.append(time.monotonic())
+            return self.healthy
+
+        self.healthcheck = healthcheck
+        registry.register_healthcheck(healthcheck)
+        registry._registry_loaded = True
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_circuit_disabled_by_default(self):
+        for _ in range(5):
+            response = registry.run_healthchecks()[0]
+        self.assertEqual(len(self.calls), 5)
+        self.assertNotIn('circuit', response.kwargs)
+
+    @override_settings(HEALTHCHECK_CIRCUIT_BREAKER_THRESHOLD=3, HEALTHCHECK_CIRCUIT_BREAKER_COOLDOWN=60)
+    def test_circuit_opens_after_consecutive_failures(self):
+        responses = [registry.run_healthchecks()[0] for _ in range(5)]
+        self.assertEqual(len(self.calls), 3)
+        self.assertListEqual([response.kwargs['circuit'] for response in responses],
+                             ['closed', 'closed', 'open', 'open', 'open'])
+        self.assertFalse(responses[-1].status)
+        self.assertEqual(responses[-1].kwargs['error'], 'Not run after 3 consecutive failures')
+        self.assertIsNotNone(responses[-1].kwargs['last_attempt'])
+        self.assertNotIn('duration_ms', responses[-1].get_dict())
+
+    @override_settings(HEALTHCHECK_CIRCUIT_BREAKER_THRESHOLD=2, HEALTHCHECK_CIRCUIT_BREAKER_COOLDOWN=0.05)
+    def test_half_open_trial(self):
+        registry.run_healthchecks()
+        registry.run_healthchecks()
+        self.assertEqual(registry.run_healthchecks()[0].kwargs['circuit'], 'open')
+        self.assertEqual(len(self.calls), 2)
+
+        # a failed trial opens the circuit again straight away
+        time.sleep(0.06)
+        self.assertEqual(registry.run_healthchecks()[0].kwargs['circuit'], 'open')
+        self.assertEqual(len(self.calls), 3)
+        registry.run_healthchecks()
+        self.assertEqual(len(self.calls), 3)
+
+        # a passing trial closes it
+        time.sleep(0.06)
+        self.healthy = True
+        response = registry.run_healthchecks()[0]
+        self.assertTrue(response.status)
+        self.assertEqual(response.kwargs['circuit'], 'closed')
+        self.assertEqual(len(self.calls), 4)
+
+    @override_settings(HEALTHCHECK_CIRCUIT_BREAKER_THRESHOLD=2)
+    def test_success_resets_failures(self):
+        registry.run_healthchecks()
+        self.healthy = True
+        registry.run_healthchecks()
+        self.healthy = False
+        response = registry.run_healthchecks()[0]
+        self.assertEqual(response.kwargs['circuit'], 'closed')
+
+    def test_threshold_attribute(self):
+        self.healthcheck.circuit_breaker_threshold = 1
+        self.healthcheck.circuit_breaker_cooldown = 60
+        registry.run_healthchecks()
+        registry.run_healthchecks()
+        self.assertEqual(len(self.calls), 1)
+
+    @override_settings(HEALTHCHECK_CIRCUIT_BREAKER_THRESHOLD=5, HEALTHCHECK_MAX_WORKERS=2, HEALTHCHECK_DEADLINE=0.05)
+    def test_abandoned_run_recorded_once(self):
+        def slow_healthcheck():
+            time.sleep(0.1)
+            return False
+
+        registry.reset()
+        registry.register_healthcheck(slow_healthcheck)
+        registry._registry_loaded = True
+        response, = registry.run_healthchecks()
+        self.assertTrue(response.kwargs['timed_out'])
+        registry._pooled_runs['slow_healthcheck'].result(5)
+
+        self.assertEqual(registry.get_circuit_breaker(slow_healthcheck).failures, 1)
+        self.assertEqual(registry.metrics.snapshot()['healthchecks']['slow_healthcheck']['failed'], 1)
+
+    @override_settings(HEALTHCHECK_CIRCUIT_BREAKER_THRESHOLD=5, HEALTHCHECK_DEADLINE=0.05)
+    def test_cancelled_async_run_recorded_once(self):
+        async def slow_healthcheck():
+            await asyncio.sleep(5)
+            return True
+
+        registry.reset()
+        registry.register_healthcheck(slow_healthcheck)
+        registry._registry_loaded = True
+        response, = asyncio.run(registry.arun_healthchecks())
+        self.assertTrue(response.kwargs['timed_out'])
+
+        self.assertEqual(registry.get_circuit_breaker(slow_healthcheck).failures, 1)
+        self.assertEqual(registry.metrics.snapshot()['healthchecks']['slow_healthcheck']['failed'], 1)
+
+    @override_settings(HEALTHCHECK_CIRCUIT_BREAKER_THRESHOLD=1, HEALTHCHECK_CIRCUIT_BREAKER_COOLDOWN=60)
+    def test_circuit_in_json(self):
+        registry.run_healthchecks()
+        response = self.client.get(reverse('healthcheck_json'))
+        self.assertEqual(response.status_code, 500)
+        data = response.json()
+        self.assertEqual(data['healthcheck']['circuit'], 'open')
+        self.assertIn('last_attempt', data['healthcheck'])
+
+
+class RateLimitedHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.calls = 0
+        self.healthy = True
+
+        def healthcheck():
+            self.calls += 1
+            return HealthcheckResponse('healthcheck', self.healthy, calls=self.calls)
+
+        self.healthcheck = healthcheck
+        registry.register_healthcheck(healthcheck)
+        registry._registry_loaded = True
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_not_limited_by_default(self):
+        for _ in range(5):
+            response = registry.run_healthchecks()[0]
+        self.assertEqual(self.calls, 5)
+        self.assertNotIn('rate_limited', response.kwargs)
+
+    @override_settings(HEALTHCHECK_RATE_LIMIT=0.01, HEALTHCHECK_RATE_LIMIT_BURST=2)
+    def test_last_result_returned_when_limited(self):
+        responses = [registry.run_healthchecks()[0] for _ in range(2)]
+        self.healthy = False
+        responses += [registry.run_healthchecks()[0] for _ in range(3)]
+
+        self.assertEqual(self.calls, 2)
+        self.assertListEqual([response.kwargs.get('rate_limited', False) for response in responses],
+                             [False, False, True, True, True])
+        self.assertTrue(responses[-1].status)
+        self.assertEqual(responses[-1].kwargs['calls'], 2)
+        self.assertNotIn('rate_limited', registry._last_responses['healthcheck'].kwargs)
+
+    @override_settings(HEALTHCHECK_RATE_LIMIT=20)
+    def test_tokens_refill(self):
+        registry.run_healthchecks()
+        self.assertTrue(registry.run_healthchecks()[0].kwargs['rate_limited'])
+        time.sleep(0.06)
+        self.assertNotIn('rate_limited', registry.run_healthchecks()[0].kwargs)
+        self.assertEqual(self.calls, 2)
+
+    def test_rate_limit_attribute(self):
+        self.healthcheck.rate_limit = 0.01
+        for _ in range(3):
+            registry.run_healthchecks()
+        self.assertEqual(self.calls, 1)
+
+    def test_token_bucket_under_many_threads(self):
+        bucket = TokenBucket(rate=0.01, burst=10)
+        allowed = []
+        threads = [threading.Thread(target=lambda: allowed.append(bucket.consume())) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(allowed.count(True), 10)
+
+    @override_settings(HEALTHCHECK_RATE_LIMIT=0.01)
+    def test_rate_limited_result_keeps_etag(self):
+        first_response = self.client.get(reverse('healthcheck_json'))
+        response = self.client.get(reverse('healthcheck_json'))
+        self.assertTrue(response.json()['healthcheck']['rate_limited'])
+        self.assertEqual(response['ETag'], first_response['ETag'])
+
+    @override_settings(HEALTHCHECK_RATE_LIMIT=0.01)
+    def test_async_rate_limited(self):
+        async def async_healthcheck():
+            self.calls += 1
+            return True
+
+        registry.reset()
+        registry.register_healthcheck(async_healthcheck)
+        registry._registry_loaded = True
+        responses = [asyncio.run(registry.arun_healthchecks())[0] for _ in range(2)]
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(responses[1].status)
+        self.assertTrue(responses[1].kwargs['rate_limited'])
+
+
+class ClassHealthcheckLifecycleTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.events = []
+        events = self.events
+
+        class ClassHealthcheck:
+            name = 'class_healthcheck'
+
+            def __init__(self):
+                events.append('init')
+
+            def setup(self):
+                events.append('setup')
+
+            def teardown(self):
+                events.append('teardown')
+
+            def __call__(self):
+                events.append('call')
+                return True
+
+        self.healthcheck = ClassHealthcheck
+
+    def tearDown(self):
+        registry.reset()
+
+    @override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False)
+    def test_class_instantiated_once_when_loaded(self):
+        registry.register_healthcheck(self.healthcheck)
+        registry.get_healthchecks()
+        self.assertListEqual(self.events, ['init', 'setup'])
+        registry.run_healthchecks()
+        registry.run_healthchecks()
+        self.assertListEqual(self.events, ['init', 'setup', 'call', 'call'])
+        registry.reset()
+        self.assertListEqual(self.events, ['init', 'setup', 'call', 'call', 'teardown'])
+
+    def test_instantiate_per_run(self):
+        self.healthcheck.instantiate_per_run = True
+        registry.register_healthcheck(self.healthcheck)
+        registry._registry_loaded = True
+        registry.run_healthchecks()
+        registry.run_healthchecks()
+        registry.reset()
+        self.assertListEqual(self.events, ['init', 'call', 'init', 'call'])
+
+    @override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False)
+    def test_failed_setup_is_retried(self):
+        self.healthcheck.setup = mock.Mock(side_effect=[ValueError('unavailable'), None])
+        registry.register_healthcheck(self.healthcheck)
+        with self.assertLogs('moj_irat.healthchecks', 'ERROR'):
+            registry.get_healthchecks()
+        response = registry.run_healthchecks()[0]
+        self.assertTrue(response.status)
+        self.assertEqual(response.name, 'class_healthcheck')
+        self.assertEqual(self.events, ['init', 'init', 'call'])
+
+
+class DatabaseHealthcheckTestCase(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.healthcheck = DatabaseHealthcheck()
+
+    def tearDown(self):
+        self.healthcheck.teardown()
+
+    def test_all_databases_checked(self):
+        response = self.healthcheck()
+        self.assertTrue(response.status)
+        self.assertEqual(response.name, 'database')
+        self.assertListEqual(sorted(response.kwargs['databases']), ['default', 'replica'])
+        for result in response.kwargs['databases'].values():
+            self.assertTrue(result['status'])
+            self.assertGreaterEqual(result['duration_ms'], 0)
+
+    def test_chosen_databases_checked(self):
+        healthcheck = DatabaseHealthcheck(name='replica', aliases=['replica'])
+        response = healthcheck()
+        healthcheck.teardown()
+        self.assertListEqual(list(response.kwargs['databases']), ['replica'])
+
+    def test_connection_reused_between_probes(self):
+        self.healthcheck()
+        executor = self.healthcheck._executors['default']
+        connection = executor.submit(lambda: connections['default'].connection).result()
+        self.healthcheck()
+        self.assertIs(executor.submit(lambda: connections['default'].connection).result(), connection)
+
+    def test_unknown_database(self):
+        healthcheck = DatabaseHealthcheck(aliases=['default', 'missing'])
+        response = healthcheck()
+        healthcheck.teardown()
+        self.assertFalse(response.status)
+        self.assertTrue(response.kwargs['databases']['default']['status'])
+        self.assertFalse(response.kwargs['databases']['missing']['status'])
+        self.assertIn('missing', response.kwargs['databases']['missing']['error'])
+
+    def test_slow_database_times_out_without_piling_up(self):
+        release = threading.Event()
+        calls = []
+
+        def query_database(alias, timeout):
+            calls.append(alias)
+            release.wait(1)
+            return 0
+
+        healthcheck = DatabaseHealthcheck(aliases=['default'], statement_timeout=0.05)
+        with mock.patch.object(healthcheck, 'query_database', query_database):
+            response = healthcheck()
+            self.assertFalse(response.status)
+            self.assertDictEqual(response.kwargs['databases']['default'], {'status': False, 'error': 'Timed out'})
+            healthcheck()
+            release.set()
+        healthcheck.teardown()
+        self.assertListEqual(calls, ['default'])
+
+    def test_statement_timeout_query(self):
+        self.assertEqual(DatabaseHealthcheck.get_query('postgresql', 2),
+                         'BEGIN; SET LOCAL statement_timeout = 2000; SELECT 1; COMMIT')
+        self.assertEqual(DatabaseHealthcheck.get_query('mysql', 0.5), 'SELECT /*+ MAX_EXECUTION_TIME(500) */ 1')
+        self.assertEqual(DatabaseHealthcheck.get_query('sqlite', 2), 'SELECT 1')
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'},
+})
+class CacheHealthcheckTestCase(TestCase):
+    def test_all_caches_checked(self):
+        response = CacheHealthcheck()()
+        self.assertTrue(response.status)
+        self.assertEqual(response.name, 'cache')
+        self.assertListEqual(sorted(response.kwargs['caches']), ['default', 'sessions'])
+        for result in response.kwargs['caches'].values():
+            self.assertTrue(result['status'])
+            self.assertGreaterEqual(result['duration_ms'], 0)
+
+    def test_chosen_caches_checked(self):
+        response = CacheHealthcheck(aliases=['sessions'])()
+        self.assertListEqual(list(response.kwargs['caches']), ['sessions'])
+
+    def test_key_expires(self):
+        from django.core.cache import caches
+
+        healthcheck = CacheHealthcheck(aliases=['default'], key_ttl=0.05)
+        healthcheck()
+        self.assertIsNotNone(caches['default'].get(healthcheck.key))
+        time.sleep(0.06)
+        self.assertIsNone(caches['default'].get(healthcheck.key))
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'dummy': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    })
+    def test_unusable_cache(self):
+        response = CacheHealthcheck()()
+        self.assertFalse(response.status)
+        self.assertTrue(response.kwargs['caches']['default']['status'])
+        self.assertFalse(response.kwargs['caches']['dummy']['status'])
+        self.assertEqual(response.kwargs['caches']['dummy']['error'], 'Value could not be read back')
+
+    def test_cache_error(self):
+        response = CacheHealthcheck(aliases=['missing'])()
+        self.assertFalse(response.status)
+        self.assertIn('missing', response.kwargs['caches']['missing']['error'])
+
+
+@override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False)
+class LazyHealthcheckTestCase(TestCase):
+    module = 'tests.app.lazy_healthchecks'
+    path = 'tests.app.lazy_healthchecks.lazy_healthcheck'
+
+    def setUp(self):
+        registry.reset()
+        sys.modules.pop(self.module, None)
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_dotted_path_imported_when_first_run(self):
+        registry.register_healthcheck(self.path)
+        registry.ensure_loaded()
+        self.assertNotIn(self.module, sys.modules)
+        response = registry.run_healthchecks()[0]
+        self.assertIn(self.module, sys.modules)
+        self.assertEqual(response.name, 'lazy')
+        self.assertTrue(response.status)
+
+    def test_dotted_path_with_tags_not_imported_for_other_tiers(self):
+        registry.register_healthcheck(self.path, tags=['deep'])
+        self.assertListEqual(registry.run_healthchecks('liveness'), [])
+        self.assertIn('deep', registry.get_tiers())
+        self.assertNotIn(self.module, sys.modules)
+        self.assertListEqual([response.name for response in registry.run_healthchecks('deep')], ['lazy'])
+
+    def test_dotted_path_without_tags_not_imported_for_other_tiers(self):
+        registry.register_healthcheck(self.path)
+        self.assertListEqual(registry.run_healthchecks('liveness'), [])
+        self.assertNotIn(self.module, sys.modules)
+        self.assertListEqual([response.name for response in registry.run_healthchecks('readiness')], ['lazy'])
+
+    def test_dotted_path_import_error(self):
+        registry.register_healthcheck('tests.app.lazy_healthchecks.missing_healthcheck')
+        with self.assertLogs('moj_irat.healthchecks', 'ERROR'):
+            response = registry.run_healthchecks()[0]
+        self.assertFalse(response.status)
+        self.assertEqual(response.name, 'tests.app.lazy_healthchecks.missing_healthcheck')
+        self.assertEqual(response.kwargs['exception_class'], 'ImportError')
+
+    @override_settings(HEALTHCHECKS=[path], HEALTHCHECK_LAZY_IMPORT=True)
+    def test_lazy_import_setting(self):
+        registry.ensure_loaded()
+        self.assertNotIn(self.module, sys.modules)
+        self.assertListEqual([response.name for response in registry.run_healthchecks()], ['lazy'])
+
+    def test_app_config_installed(self):
+        from django.apps import apps
+
+        from moj_irat.apps import MojIratConfig
+
+        self.assertIsInstance(apps.get_app_config('moj_irat'), MojIratConfig)
+
+    @override_settings(HEALTHCHECKS=[path], HEALTHCHECK_PRELOAD=True)
+    def test_preload_on_ready(self):
+        from django.apps import apps
+
+        apps.get_app_config('moj_irat').ready()
+        self.assertTrue(registry._registry_loaded)
+        self.assertIn(self.module, sys.modules)
+
+
+class HealthcheckSerialisationTestCase(TestCase):
+    def test_response_has_no_instance_dict(self):
+        response = HealthcheckResponse('check', True)
+        self.assertFalse(hasattr(response, '__dict__'))
+
+    def test_result_excludes_name(self):
+        response = HealthcheckResponse('check', False, error='error')
+        response.set_duration(0.0015)
+        self.assertDictEqual(response.get_result(), {'status': False, 'error': 'error', 'duration_ms': 1.5})
+        self.assertDictEqual(response.get_dict(), dict(response.get_result(), name='check'))
+
+    def test_dumps(self):
+        data = {'check': {'status': True, 'amount': decimal.Decimal('1.5'), 'large': 2 ** 70}, '*': {'status': True}}
+        expected_data = {'check': {'status': True, 'amount': '1.5', 'large': 2 ** 70}, '*': {'status': True}}
+        self.assertDictEqual(json.loads(dumps(data)), expected_data)
+        with override_settings(HEALTHCHECK_FAST_JSON=False):
+            self.assertDictEqual(json.loads(dumps(data)), expected_data)
+
+    def test_rendered_with_sorted_keys(self):
+        responses = [HealthcheckResponse('b', True), HealthcheckResponse('a', False, error='error')]
+        response = HealthcheckView().render_healthchecks(responses)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertListEqual(list(json.loads(response.content)), ['*', 'a', 'b'])
+        self.assertListEqual(list(json.loads(response.content)['a']), ['error', 'status'])
+
+
+class HealthcheckTimeoutTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        registry._registry_loaded = True
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.calls = []
+
+        @healthcheck_timeout(0.05)
+        def hanging_healthcheck():
+            self.calls.append(threading.current_thread())
+            self.release.wait(5)
+            return True
+
+        self.hanging_healthcheck = hanging_healthcheck
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_hanging_healthcheck_abandoned(self):
+        registry.register_healthcheck(self.hanging_healthcheck)
+        started = time.monotonic()
+        response, = registry.run_healthchecks()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertFalse(response.status)
+        self.assertDictEqual(response.kwargs, {
+            'exception': 'Did not finish within 0.05 seconds',
+            'exception_class': 'Timeout',
+            'timed_out': True,
+        })
+
+    def test_hanging_healthcheck_not_run_again_while_running(self):
+        registry.register_healthcheck(self.hanging_healthcheck)
+        for _ in range(3):
+            response, = registry.run_healthchecks()
+            self.assertEqual(response.kwargs['exception_class'], 'Timeout')
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(self.calls[0].daemon)
+
+        self.release.set()
+        self.calls[0].join(1)
+        response, = registry.run_healthchecks()
+        self.assertTrue(response.status)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_exceptions_reported(self):
+        @healthcheck_timeout(1)
+        def error_healthcheck():
+            raise ValueError('error')
+
+        registry.register_healthcheck(error_healthcheck)
+        response, = registry.run_healthchecks()
+        self.assertEqual(response.kwargs['exception_class'], 'ValueError')
+
+    @override_settings(HEALTHCHECK_TIMEOUT=0.05)
+    def test_timeout_setting(self):
+        def hanging_healthcheck():
+            self.release.wait(5)
+            return True
+
+        registry.register_healthcheck(hanging_healthcheck)
+        response, = registry.run_healthchecks()
+        self.assertEqual(response.kwargs['exception_class'], 'Timeout')
+
+    @override_settings(HEALTHCHECK_TIMEOUT=1)
+    def test_url_healthchecks_run_on_calling_thread(self):
+        threads = []
+
+        class RecordingUrlHealthcheck(UrlHealthcheck):
+            def __call__(self):
+                threads.append(threading.current_thread())
+                return super().__call__()
+
+        with StubHTTPServer() as server:
+            registry.register_healthcheck(RecordingUrlHealthcheck(name='url', url=server.url))
+            response, = registry.run_healthchecks()
+        self.assertTrue(response.status)
+        self.assertListEqual(threads, [threading.current_thread()])
+
+    def test_async_healthcheck_timeout(self):
+        @healthcheck_timeout(0.05)
+        async def hanging_healthcheck():
+            await asyncio.sleep(5)
+            return True
+
+        registry.register_healthcheck(hanging_healthcheck)
+        response, = registry.run_healthchecks()
+        self.assertEqual(response.kwargs['exception_class'], 'Timeout')
+
+
+class DependencyHealthcheckTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        registry._registry_loaded = True
+        self.calls = []
+
+    def tearDown(self):
+        registry.reset()
+
+    def make_healthcheck(self, name, status=True, wait=None):
+        def healthcheck():
+            self.calls.append(name)
+            if wait is not None:
+                wait()
+            return status
+
+        healthcheck.name = name
+        return healthcheck
+
+    def test_dependants_of_failed_healthcheck_skipped(self):
+        registry.register_healthcheck(self.make_healthcheck('api', True), depends_on=['proxy'])
+        registry.register_healthcheck(self.make_healthcheck('proxy', False))
+        registry.register_healthcheck(self.make_healthcheck('search', True), depends_on=['api'])
+        registry.register_healthcheck(self.make_healthcheck('database', True))
+
+        responses = registry.run_healthchecks()
+        self.assertListEqual([response.name for response in responses], ['api', 'proxy', 'search', 'database'])
+        self.assertListEqual(sorted(self.calls), ['database', 'proxy'])
+        api, proxy, search, database = responses
+        self.assertDictEqual(api.get_dict(), {
+            'name': 'api', 'status': False, 'skipped': 'dependency_failed', 'dependency': 'proxy',
+        })
+        self.assertDictEqual(search.kwargs, {'skipped': 'dependency_failed', 'dependency': 'api'})
+        self.assertTrue(database.status)
+
+    def test_dependants_run_after_dependencies_pass(self):
+        healthcheck = self.make_healthcheck('api')
+        healthcheck.depends_on = ['proxy']
+        registry.register_healthcheck(healthcheck)
+        registry.register_healthcheck(self.make_healthcheck('proxy'))
+
+        responses = registry.run_healthchecks()
+        self.assertTrue(all(response.status for response in responses))
+        self.assertListEqual(self.calls, ['proxy', 'api'])
+
+    @override_settings(HEALTHCHECK_MAX_WORKERS=4)
+    def test_independent_branches_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+        registry.register_healthcheck(self.make_healthcheck('proxy'))
+        registry.register_healthcheck(self.make_healthcheck('api', wait=barrier.wait), depends_on=['proxy'])
+        registry.register_healthcheck(self.make_healthcheck('search', wait=barrier.wait), depends_on=['proxy'])
+
+        responses = registry.run_healthchecks()
+        self.assertTrue(all(response.status for response in responses))
+        self.assertEqual(self.calls[0], 'proxy')
+
+    @override_settings(HEALTHCHECK_DEADLINE=0.05)
+    def test_dependants_time_out_at_deadline(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        registry.register_healthcheck(self.make_healthcheck('proxy', wait=lambda: release.wait(5)))
+        registry.register_healthcheck(self.make_healthcheck('api'), depends_on=['proxy'])
+
+        proxy, api = registry.run_healthchecks()
+        self.assertTrue(proxy.kwargs['timed_out'])
+        self.assertTrue(api.kwargs['timed_out'])
+        self.assertListEqual(self.calls, ['proxy'])
+
+    @override_settings(HEALTHCHECK_MAX_WORKERS=4)
+    def test_dependencies_time_out_after_their_own_timeout(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        proxy = self.make_healthcheck('proxy', wait=lambda: release.wait(5))
+        proxy.timeout = 0.05
+        # as a healthcheck that should apply its timeout itself but hangs anyway
+        proxy.enforces_timeout = True
+        registry.register_healthcheck(proxy)
+        registry.register_healthcheck(self.make_healthcheck('api'), depends_on=['proxy'])
+        registry.register_healthcheck(self.make_healthcheck('database'))
+
+        started = time.monotonic()
+        proxy, api, database = registry.run_healthchecks()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(proxy.kwargs['timed_out'])
+        self.assertDictEqual(api.kwargs, {'skipped': 'dependency_failed', 'dependency': 'proxy'})
+        self.assertTrue(database.status)
+
+    def test_circular_dependencies(self):
+        registry.register_healthcheck(self.make_healthcheck('a'), depends_on=['b'])
+        registry.register_healthcheck(self.make_healthcheck('b'), depends_on=['a'])
+        registry.register_healthcheck(self.make_healthcheck('c'), depends_on=['a'])
+        registry.register_healthcheck(self.make_healthcheck('d'))
+
+        responses = registry.run_healthchecks()
+        self.assertListEqual([response.get_dict() for response in responses[:3]], [
+            {'name': name, 'status': False, 'skipped': 'circular_dependency'} for name in ('a', 'b', 'c')
+        ])
+        self.assertTrue(responses[3].status)
+        self.assertListEqual(self.calls, ['d'])
+
+    def test_async_circular_dependencies(self):
+        registry.register_healthcheck(self.make_healthcheck('a'), depends_on=['b'])
+        registry.register_healthcheck(self.make_healthcheck('b'), depends_on=['a'])
+        registry.register_healthcheck(self.make_healthcheck('c'))
+
+        a, b, c = asyncio.run(registry.arun_healthchecks())
+        self.assertEqual(a.kwargs['skipped'], 'circular_dependency')
+        self.assertEqual(b.kwargs['skipped'], 'circular_dependency')
+        self.assertTrue(c.status)
+
+    @override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False)
+    def test_circular_dependencies_logged_when_loaded(self):
+        registry._registry_loaded = False
+        registry.register_healthcheck(self.make_healthcheck('a'), depends_on=['b'])
+        registry.register_healthcheck(self.make_healthcheck('b'), depends_on=['a'])
+        with self.assertLogs('moj_irat.healthchecks', 'ERROR') as logs:
+            registry.ensure_loaded()
+        self.assertIn('Healthchecks have circular dependencies: a, b', logs.output[0])
+
+    def test_async_dependants_of_failed_healthcheck_skipped(self):
+        async def proxy():
+            self.calls.append('proxy')
+            return False
+
+        async def api():
+            self.calls.append('api')
+            return True
+
+        registry.register_healthcheck(api, depends_on=['proxy'])
+        registry.register_healthcheck(proxy)
+        registry.register_healthcheck(self.make_healthcheck('database'), depends_on=['proxy'])
+
+        responses = asyncio.run(registry.arun_healthchecks())
+        self.assertListEqual([response.name for response in responses], ['api', 'proxy', 'database'])
+        self.assertListEqual(self.calls, ['proxy'])
+        self.assertEqual(responses[2].kwargs['skipped'], 'dependency_failed')
+
+    @override_settings(HEALTHCHECK_DEADLINE=0.2)
+    def test_async_dependants_time_out_at_deadline(self):
+        async def proxy():
+            await asyncio.sleep(0.15)
+            return True
+
+        async def api():
+            await asyncio.sleep(0.15)
+            return True
+
+        registry.register_healthcheck(proxy)
+        registry.register_healthcheck(api, depends_on=['proxy'])
+
+        started = time.monotonic()
+        proxy_response, api_response = asyncio.run(registry.arun_healthchecks())
+        self.assertLess(time.monotonic() - started, 0.28)
+        self.assertTrue(proxy_response.status)
+        self.assertTrue(api_response.kwargs['timed_out'])
+
+
+@override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False)
+class ConditionalHealthcheckViewTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.status = True
+        self.payload = {'status': 'OK'}
+
+        def healthcheck():
+            return HealthcheckResponse('api', self.status, response=self.payload)
+
+        registry.register_healthcheck(healthcheck)
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_etag_ignores_timings(self):
+        first = self.client.get(reverse('healthcheck_json'))
+        second = self.client.get(reverse('healthcheck_json'))
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertEqual(first['ETag'], second['ETag'])
+
+        self.payload = {'status': 'DEGRADED'}
+        third = self.client.get(reverse('healthcheck_json'))
+        self.assertNotEqual(first['ETag'], third['ETag'])
+
+    def test_etag_includes_embedded_responses(self):
+        self.payload = {'status': 'OK', 'age': 1, 'history': []}
+        etag = self.client.get(reverse('healthcheck_json'))['ETag']
+        self.payload = {'status': 'OK', 'age': 2, 'history': []}
+        response = self.client.get(reverse('healthcheck_json'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified(self):
+        etag = self.client.get(reverse('healthcheck_json'))['ETag']
+        response = self.client.get(reverse('healthcheck_json'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_failing_healthchecks_never_not_modified(self):
+        self.status = False
+        etag = self.client.get(reverse('healthcheck_json'))['ETag']
+        response = self.client.get(reverse('healthcheck_json'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 500)
+
+    def test_async_not_modified(self):
+        etag = self.client.get(reverse('healthcheck_json'))['ETag']
+        request = RequestFactory().get('/healthcheck.json', HTTP_IF_NONE_MATCH=etag)
+        response = asyncio.run(AsyncHealthcheckView.as_view()(request))
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(HEALTHCHECK_GZIP_MIN_SIZE=1024)
+    def test_large_responses_compressed(self):
+        self.payload = {'items': list(range(1000))}
+        response = self.client.get(reverse('healthcheck_json'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertDictEqual(json.loads(gzip.decompress(response.content))['api']['response'], self.payload)
+
+        response = self.client.get(reverse('healthcheck_json'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        self.payload = {'status': 'OK'}
+        response = self.client.get(reverse('healthcheck_json'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
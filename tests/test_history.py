@@ -0,0 +1,80 @@
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from moj_irat.healthchecks import registry
+from moj_irat.history import HealthcheckHistory
+from tests.utils import TestCase
+
+
+class HealthcheckHistoryTestCase(TestCase):
+    def test_ring_keeps_last_results(self):
+        history = HealthcheckHistory(size=3)
+        for index in range(5):
+            history.record('database', index % 2 == 0, index / 1000)
+        self.assertEqual(history.get_results('database'), ([1, 0, 1], [0.002, 0.003, 0.004]))
+        self.assertIsNone(history.get_results('cache'))
+        self.assertEqual(len(history._rings['database'].statuses), 3)
+
+    def test_summary(self):
+        history = HealthcheckHistory(size=20)
+        for index in range(20):
+            history.record('database', index != 5, (index + 1) / 1000)
+        self.assertDictEqual(history.get_summary('database'), {
+            'runs': 20,
+            'success_rate': 0.95,
+            'p95_ms': 19.0,
+            'flapping': False,
+        })
+
+    def test_flapping(self):
+        history = HealthcheckHistory(size=10, flapping_threshold=0.3)
+        for status in (True, False, True, True, False, True):
+            history.record('api', status, 0.001)
+        self.assertTrue(history.get_summary('api')['flapping'])
+        for _ in range(6):
+            history.record('api', True, 0.001)
+        self.assertFalse(history.get_summary('api')['flapping'])
+
+    def test_disabled(self):
+        history = HealthcheckHistory()
+        history.record('database', True, 0.001)
+        self.assertIsNone(history.get_summary('database'))
+
+
+@override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False, HEALTHCHECK_HISTORY_SIZE=5)
+class HealthcheckHistoryViewTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.statuses = [True, False, True]
+
+        def flapping_healthcheck():
+            return self.statuses.pop(0)
+
+        registry.register_healthcheck(flapping_healthcheck)
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_history_in_healthcheck_json(self):
+        self.client.get(reverse('healthcheck_json'))
+        self.client.get(reverse('healthcheck_json'))
+        response = self.client.get(reverse('healthcheck_json'))
+        history = response.json()['flapping_healthcheck']['history']
+        self.assertEqual(history['runs'], 3)
+        self.assertEqual(history['success_rate'], 0.6667)
+        self.assertTrue(history['flapping'])
+
+    @override_settings(HEALTHCHECK_HISTORY_SIZE=0)
+    def test_history_not_kept_by_default(self):
+        response = self.client.get(reverse('healthcheck_json'))
+        self.assertNotIn('history', response.json()['flapping_healthcheck'])
+
+    def test_history_view(self):
+        self.client.get(reverse('healthcheck_json'))
+        self.client.get(reverse('healthcheck_json'))
+        response = self.client.get(reverse('healthcheck_history'))
+        self.assertEqual(response.status_code, 200)
+        history = response.json()['flapping_healthcheck']
+        self.assertListEqual(history['results'], [True, False])
+        self.assertEqual(len(history['durations_ms']), 2)
+        self.assertEqual(history['success_rate'], 0.5)
@@ -0,0 +1,108 @@
+from django.core.exceptions import ImproperlyConfigured
+import responses
+
+from moj_irat.healthchecks import UrlHealthcheck
+from moj_irat.jsonpath import JsonPathAssertions
+from tests.utils import TestCase
+
+
+class JsonPathAssertionsTestCase(TestCase):
+    document = {
+        'status': 'OK',
+        'version': '1.2.3',
+        'queue': {'length': 12},
+        'results': [
+            {'test': 123, 'status': 'up'},
+            {'test': 456, 'status': 'up'},
+        ],
+    }
+
+    def check(self, value_at_json_path):
+        return JsonPathAssertions.from_setting(value_at_json_path).check(self.document)
+
+    def test_single_assertion(self):
+        self.assertIsNone(self.check((123, 'results.0.test')))
+        self.assertIsNone(self.check((456, 'results.-1.test')))
+        self.assertEqual(self.check((124, 'results.0.test')),
+                         'Response JSON path "results.0.test" did not contain "124"')
+
+    def test_missing_paths(self):
+        for path in ('missing', 'results.2.test', 'results.test', 'status.0', 'results.*.missing'):
+            self.assertEqual(self.check((None, path)), 'Response JSON path "%s" does not exist' % path)
+
+    def test_multiple_assertions(self):
+        self.assertIsNone(self.check([
+            ('OK', 'status'),
+            (100, 'queue.length', 'lt'),
+            (r'^1\.', 'version', 'regex'),
+            (['up', 'degraded'], 'results.0.status', 'in'),
+        ]))
+        self.assertEqual(self.check([
+            ('OK', 'status'),
+            (10, 'queue.length', 'lte'),
+        ]), 'Response JSON path "queue.length" was not at most "10"')
+
+    def test_operators(self):
+        self.assertIsNone(self.check((12, 'queue.length', 'gte')))
+        self.assertIsNone(self.check((11, 'queue.length', 'gt')))
+        self.assertIsNotNone(self.check((12, 'queue.length', 'gt')))
+        self.assertIsNotNone(self.check((12, 'status', 'gt')))
+        self.assertIsNotNone(self.check(('^2', 'version', 'regex')))
+        self.assertIsNotNone(self.check(('^1', 'queue.length', 'regex')))
+        self.assertIsNotNone(self.check((['down'], 'results.0.status', 'in')))
+
+    def test_wildcards_match_all_items(self):
+        self.assertIsNone(self.check(('up', 'results.*.status')))
+        self.assertIsNone(self.check((100, 'results.*.test', 'gt')))
+        self.assertEqual(self.check((123, 'results.*.test')),
+                         'Response JSON path "results.*.test" did not contain "123"')
+        self.assertIsNone(self.check((12, '*.length')))
+
+    def test_single_pass_over_document(self):
+        assertions = JsonPathAssertions.from_setting([
+            ('OK', 'status'),
+            (123, 'results.0.test'),
+            ('up', 'results.0.status'),
+        ])
+        self.assertEqual(len(assertions.root.children), 2)
+        found = assertions.find_values(self.document)
+        self.assertListEqual(found, [['OK'], [123], ['up']])
+
+    def test_invalid_assertions(self):
+        invalid = [
+            ('OK', ''),
+            ('OK', 'results..test'),
+            ('OK', 'status', 'like'),
+            ('[', 'status', 'regex'),
+            (1, 'status', 'in'),
+            [('OK',)],
+            'OK',
+        ]
+        for value_at_json_path in invalid:
+            with self.assertRaises(ImproperlyConfigured, msg=value_at_json_path):
+                JsonPathAssertions.from_setting(value_at_json_path)
+
+    def test_url_healthcheck_validates_paths_when_created(self):
+        with self.assertRaises(ImproperlyConfigured):
+            UrlHealthcheck(name='url', url='http://www.example.com/', value_at_json_path=('OK', 'status.'))
+
+    def test_url_healthcheck_with_multiple_assertions(self):
+        url = 'http://www.example.com/'
+        healthcheck = UrlHealthcheck(name='url', url=url, value_at_json_path=[
+            ('OK', 'status'),
+            (50, 'queue.length', 'gt'),
+        ])
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, url, json=self.document)
+            response = healthcheck()
+        self.assertFalse(response.status)
+        self.assertEqual(response.kwargs['error'], 'Response JSON path "queue.length" was not greater than "50"')
+
+    def test_url_healthcheck_with_invalid_json(self):
+        url = 'http://www.example.com/'
+        healthcheck = UrlHealthcheck(name='url', url=url, value_at_json_path=('OK', 'status'))
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, url, body='not json')
+            response = healthcheck()
+        self.assertFalse(response.status)
+        self.assertEqual(response.kwargs['error'], 'Response JSON path "status" does not exist')
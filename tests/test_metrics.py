@@ -0,0 +1,159 @@
+import pathlib
+import tempfile
+import time
+from unittest import mock
+
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from moj_irat.healthchecks import registry
+from moj_irat.metrics import HealthcheckMetrics, merge_snapshots, read_snapshots, render_prometheus
+from tests.utils import TestCase
+
+
+class HealthcheckMetricsTestCase(TestCase):
+    def test_histogram_buckets_and_counters(self):
+        metrics = HealthcheckMetrics(buckets=(0.1, 1))
+        metrics.observe('database', 0.05, True)
+        metrics.observe('database', 0.5, True)
+        metrics.observe('database', 5, False)
+        self.assertDictEqual(metrics.snapshot(), {
+            'buckets': [0.1, 1],
+            'healthchecks': {
+                'database': {'buckets': [1, 1, 1], 'sum': 5.55, 'passed': 2, 'failed': 1, 'status': False,
+                             'updated_at': mock.ANY},
+            },
+        })
+
+    def test_prometheus_format(self):
+        metrics = HealthcheckMetrics(buckets=(0.1, 1))
+        metrics.observe('data"base', 0.05, True)
+        metrics.observe('data"base', 0.5, True)
+        self.assertEqual(render_prometheus(metrics.snapshot()), '\n'.join([
+            '# HELP healthcheck_duration_seconds Time taken to run healthchecks.',
+            '# TYPE healthcheck_duration_seconds histogram',
+            'healthcheck_duration_seconds_bucket{healthcheck="data\\"base",le="0.1"} 1',
+            'healthcheck_duration_seconds_bucket{healthcheck="data\\"base",le="1"} 2',
+            'healthcheck_duration_seconds_bucket{healthcheck="data\\"base",le="+Inf"} 2',
+            'healthcheck_duration_seconds_sum{healthcheck="data\\"base"} 0.55',
+            'healthcheck_duration_seconds_count{healthcheck="data\\"base"} 2',
+            '# HELP healthcheck_runs_total Healthcheck runs by result.',
+            '# TYPE healthcheck_runs_total counter',
+            'healthcheck_runs_total{healthcheck="data\\"base",status="passed"} 2',
+            'healthcheck_runs_total{healthcheck="data\\"base",status="failed"} 0',
+            '# HELP healthcheck_status Whether the latest run of a healthcheck passed.',
+            '# TYPE healthcheck_status gauge',
+            'healthcheck_status{healthcheck="data\\"base"} 1',
+        ]) + '\n')
+
+    def test_snapshots_shared_between_workers(self):
+        first_worker = HealthcheckMetrics(buckets=(1,))
+        first_worker.observe('database', 0.5, True)
+        second_worker = HealthcheckMetrics(buckets=(1,))
+        second_worker.observe('database', 2, False)
+        second_worker.observe('cache', 0.5, True)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('moj_irat.metrics.process_exists', return_value=True):
+            with mock.patch('os.getpid', return_value=1):
+                first_worker.write_snapshot(directory)
+            with mock.patch('os.getpid', return_value=2):
+                second_worker.write_snapshot(directory)
+            snapshots = read_snapshots(directory)
+
+        self.assertEqual(len(snapshots), 2)
+        self.assertDictEqual(merge_snapshots(snapshots)['healthchecks'], {
+            'database': {'buckets': [1, 1], 'sum': 2.5, 'passed': 1, 'failed': 1, 'status': False,
+                         'updated_at': mock.ANY},
+            'cache': {'buckets': [1, 0], 'sum': 0.5, 'passed': 1, 'failed': 0, 'status': True,
+                      'updated_at': mock.ANY},
+        })
+
+    def test_status_taken_from_latest_run(self):
+        first_worker = HealthcheckMetrics(buckets=(1,))
+        second_worker = HealthcheckMetrics(buckets=(1,))
+        with mock.patch('time.time', return_value=100):
+            first_worker.observe('database', 0.5, True)
+        with mock.patch('time.time', return_value=50):
+            second_worker.observe('database', 0.5, False)
+
+        merged = merge_snapshots([first_worker.snapshot(), second_worker.snapshot()])
+        self.assertTrue(merged['healthchecks']['database']['status'])
+        merged = merge_snapshots([second_worker.snapshot(), first_worker.snapshot()])
+        self.assertTrue(merged['healthchecks']['database']['status'])
+
+    def test_snapshots_of_exited_workers_deleted(self):
+        worker = HealthcheckMetrics()
+        worker.observe('database', 0.5, False)
+
+        with tempfile.TemporaryDirectory() as directory:
+            worker.write_snapshot(directory)
+            with mock.patch('os.getpid', return_value=1):
+                worker.write_snapshot(directory)
+            with mock.patch('moj_irat.metrics.process_exists', side_effect=lambda pid: pid != 1):
+                self.assertEqual(len(read_snapshots(directory)), 1)
+            self.assertEqual(len(list(pathlib.Path(directory).iterdir())), 1)
+
+    def test_stale_snapshots_deleted(self):
+        worker = HealthcheckMetrics()
+        worker.observe('database', 0.5, False)
+
+        with tempfile.TemporaryDirectory() as directory:
+            worker.write_snapshot(directory)
+            self.assertEqual(len(read_snapshots(directory, max_age=60)), 1)
+            with mock.patch('time.time', return_value=time.time() + 90):
+                self.assertListEqual(read_snapshots(directory, max_age=60), [])
+            self.assertListEqual(list(pathlib.Path(directory).iterdir()), [])
+
+
+@override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False)
+class HealthcheckMetricsViewTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+
+        def passing_healthcheck():
+            return True
+
+        def failing_healthcheck():
+            raise ValueError('error')
+
+        registry.register_healthcheck(passing_healthcheck)
+        registry.register_healthcheck(failing_healthcheck)
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_healthchecks_timed(self):
+        responses = registry.run_healthchecks()
+        for response in responses:
+            self.assertIsInstance(response.duration_ms, float)
+            self.assertGreaterEqual(response.duration_ms, 0)
+            self.assertEqual(response.get_dict()['duration_ms'], response.duration_ms)
+
+    def test_metrics_view(self):
+        registry.run_healthchecks()
+        registry.run_healthchecks()
+
+        response = self.client.get(reverse('healthcheck_metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        content = response.content.decode()
+        self.assertIn('healthcheck_duration_seconds_count{healthcheck="passing_healthcheck"} 2\n', content)
+        self.assertIn('healthcheck_runs_total{healthcheck="failing_healthcheck",status="failed"} 2\n', content)
+        self.assertIn('healthcheck_status{healthcheck="failing_healthcheck"} 0\n', content)
+
+    def test_metrics_view_aggregates_workers(self):
+        other_worker = HealthcheckMetrics()
+        other_worker.observe('passing_healthcheck', 0.001, True)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(HEALTHCHECK_METRICS_DIRECTORY=directory):
+            with mock.patch('os.getpid', return_value=-1):
+                other_worker.write_snapshot(directory)
+            registry.run_healthchecks()
+            with mock.patch('moj_irat.metrics.process_exists', return_value=True):
+                response = self.client.get(reverse('healthcheck_metrics'))
+
+        content = response.content.decode()
+        self.assertIn('healthcheck_duration_seconds_count{healthcheck="passing_healthcheck"} 2\n', content)
+        self.assertIn('healthcheck_duration_seconds_count{healthcheck="failing_healthcheck"} 1\n', content)
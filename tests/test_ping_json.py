@@ -12,6 +12,9 @@ from tests.utils import TestCase
 
 
 class PingJsonViewTestCase(TestCase):
+    def setUp(self):
+        PingJsonView.clear_cache()
+
     def test_print_django_version(self):
         print(f'Testing on django {django.__version__}', file=sys.stderr)
 
@@ -115,3 +118,50 @@ class PingJsonViewTestCase(TestCase):
                 commit_id_key='DOCKER_IMAGE_SHA',
             )
         self.assertEqual('*', response['access-control-allow-origin'])
+
+    def test_ping_json_response_is_cached(self):
+        env = {
+            'DOCKER_IMAGE_DATE': '2015-12-04T10:00:00+0000',
+            'DOCKER_IMAGE_SHA': 'e9866935d3c5d19adc48e0be3ad3f2718b86bfe4',
+        }
+        view_kwargs = dict(build_date_key='DOCKER_IMAGE_DATE', commit_id_key='DOCKER_IMAGE_SHA')
+        with mock.patch.dict('os.environ', env):
+            first_response, _ = self.call_ping_json_view(**view_kwargs)
+        with mock.patch.dict('os.environ', {}, clear=True):
+            second_response, response_json = self.call_ping_json_view(**view_kwargs)
+            PingJsonView.clear_cache()
+            reloaded_response, reloaded_response_json = self.call_ping_json_view(**view_kwargs)
+
+        self.assertEqual(second_response.status_code, 200)
+        self.assertEqual(response_json['commit_id'], 'e9866935d3c5d19adc48e0be3ad3f2718b86bfe4')
+        self.assertEqual(first_response['ETag'], second_response['ETag'])
+        self.assertEqual(reloaded_response.status_code, 501)
+        self.assertIsNone(reloaded_response_json['commit_id'])
+        self.assertNotEqual(first_response['ETag'], reloaded_response['ETag'])
+
+    def test_ping_json_not_modified(self):
+        env = {
+            'APP_BUILD_DATE': '2015-12-04T10:00:00+0000',
+            'APP_GIT_COMMIT': 'e9866935d3c5d19adc48e0be3ad3f2718b86bfe4',
+        }
+        with mock.patch.dict('os.environ', env):
+            response = self.client.get(reverse('ping_json'))
+            etag = response['ETag']
+            self.assertTrue(etag.startswith('"'))
+
+            response = self.client.get(reverse('ping_json'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(response['Access-Control-Allow-Origin'], '*')
+
+            response = self.client.get(reverse('ping_json'), HTTP_IF_NONE_MATCH='"other", W/%s' % etag)
+            self.assertEqual(response.status_code, 304)
+
+            response = self.client.get(reverse('ping_json'), HTTP_IF_NONE_MATCH='"other"')
+            self.assertEqual(response.status_code, 200)
+
+    def test_incomplete_environment_ping_json_is_never_not_modified(self):
+        response = self.client.get(reverse('ping_json'))
+        response = self.client.get(reverse('ping_json'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 501)
@@ -0,0 +1,148 @@
+import asyncio
+import tempfile
+import time
+from unittest import mock
+
+from django.test.utils import override_settings
+
+from moj_irat.healthchecks import HealthcheckRegistry
+from moj_irat.stores import CacheResultStore, FileResultStore
+from tests.utils import TestCase
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'stores'}}
+
+
+class StoreTestMixin:
+    def make_store(self):
+        raise NotImplementedError
+
+    def test_get_and_set(self):
+        store = self.make_store()
+        self.assertIsNone(store.get('database'))
+        record = {'response': {'name': 'database', 'status': True}, 'cached_at': 1.5}
+        store.set('database', record)
+        self.assertDictEqual(store.get('database'), record)
+        self.assertIsNone(store.get('cache'))
+
+    def test_lock(self):
+        first_worker, second_worker = self.make_store(), self.make_store()
+        self.assertTrue(first_worker.acquire('database'))
+        self.assertFalse(second_worker.acquire('database'))
+        self.assertTrue(second_worker.acquire('cache'))
+        first_worker.release('database')
+        self.assertTrue(second_worker.acquire('database'))
+
+
+class FileResultStoreTestCase(StoreTestMixin, TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_store(self):
+        return FileResultStore(self.directory.name)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheResultStoreTestCase(StoreTestMixin, TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches['default'].clear()
+
+    def make_store(self):
+        return CacheResultStore()
+
+    def test_lock_expires(self):
+        first_worker, second_worker = CacheResultStore(lock_timeout=0.05), CacheResultStore()
+        self.assertTrue(first_worker.acquire('database'))
+        time.sleep(0.06)
+        self.assertTrue(second_worker.acquire('database'))
+        # releasing an expired lock does not release another worker's
+        first_worker.release('database')
+        self.assertFalse(first_worker.acquire('database'))
+
+
+@override_settings(HEALTHCHECKS=[], AUTODISCOVER_HEALTHCHECKS=False, HEALTHCHECK_CACHE_TTL=60,
+                   HEALTHCHECK_RESULT_STORE='moj_irat.stores.FileResultStore')
+class SharedResultTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.calls = []
+
+        def healthcheck():
+            self.calls.append(healthcheck)
+            return True
+
+        self.healthcheck = healthcheck
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_worker(self):
+        worker = HealthcheckRegistry()
+        worker.register_healthcheck(self.healthcheck)
+        return worker
+
+    def run_workers(self, *workers):
+        with self.settings(HEALTHCHECK_RESULT_STORE_OPTIONS={'directory': self.directory.name}):
+            return [worker.run_healthchecks()[0] for worker in workers]
+
+    def test_result_shared_between_workers(self):
+        first_worker, second_worker = self.make_worker(), self.make_worker()
+        first_response, second_response = self.run_workers(first_worker, second_worker)
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(second_response.status)
+        self.assertEqual(first_response.kwargs['cached_at'], second_response.kwargs['cached_at'])
+        self.assertEqual(first_response.duration_ms, second_response.duration_ms)
+
+    def test_async_result_shared_between_workers(self):
+        async def async_healthcheck():
+            self.calls.append(async_healthcheck)
+            return True
+
+        async_healthcheck.name = 'healthcheck'
+        self.healthcheck = async_healthcheck
+        first_worker, second_worker = self.make_worker(), self.make_worker()
+        with self.settings(HEALTHCHECK_RESULT_STORE_OPTIONS={'directory': self.directory.name}):
+            asyncio.run(first_worker.arun_healthchecks())
+            response, = asyncio.run(second_worker.arun_healthchecks())
+        self.assertEqual(len(self.calls), 1)
+        self.assertIn('cached_at', response.kwargs)
+
+    def test_expired_result_refreshed_by_one_worker(self):
+        first_worker, second_worker = self.make_worker(), self.make_worker()
+        self.run_workers(first_worker)
+        with mock.patch('time.time', return_value=time.time() + 90):
+            store = FileResultStore(self.directory.name)
+            self.assertTrue(store.acquire('healthcheck'))
+            # the second worker returns the expired result while another refreshes it
+            response, = self.run_workers(second_worker)
+            self.assertEqual(len(self.calls), 1)
+            self.assertGreaterEqual(response.kwargs['age'], 90)
+            store.release('healthcheck')
+            response, = self.run_workers(second_worker)
+        self.assertEqual(len(self.calls), 2)
+        self.assertLess(response.kwargs['age'], 60)
+
+    def test_stale_result_run_locally(self):
+        first_worker, second_worker = self.make_worker(), self.make_worker()
+        self.run_workers(first_worker)
+        with mock.patch('time.time', return_value=time.time() + 600):
+            store = FileResultStore(self.directory.name)
+            self.assertTrue(store.acquire('healthcheck'))
+            response, = self.run_workers(second_worker)
+            store.release('healthcheck')
+        self.assertEqual(len(self.calls), 2)
+        self.assertLess(response.kwargs['age'], 60)
+
+    @override_settings(HEALTHCHECK_RESULT_STORE='moj_irat.stores.CacheResultStore',
+                       HEALTHCHECK_RESULT_STORE_OPTIONS={}, CACHES=LOCMEM_CACHES)
+    def test_store_failure_run_locally(self):
+        worker = self.make_worker()
+        with mock.patch('django.core.cache.backends.locmem.LocMemCache.get', side_effect=ConnectionError), \
+                self.assertLogs('moj_irat.healthchecks', 'ERROR'):
+            response = worker.run_healthchecks()[0]
+        self.assertTrue(response.status)
+        self.assertEqual(len(self.calls), 1)
@@ -3,7 +3,7 @@ try:
 except ImportError:
     from django.conf.urls import url
 
-from moj_irat.views import HealthcheckView, PingJsonView
+from moj_irat.views import HealthcheckHistoryView, HealthcheckMetricsView, HealthcheckView, PingJsonView
 
 urlpatterns = [
     url(r'^ping.json$', PingJsonView.as_view(
@@ -13,4 +13,6 @@ urlpatterns = [
         build_tag_key='JENKINS_TAG',
     ), name='ping_json'),
     url(r'^healthcheck.json$', HealthcheckView.as_view(), name='healthcheck_json'),
+    url(r'^healthcheck/history.json$', HealthcheckHistoryView.as_view(), name='healthcheck_history'),
+    url(r'^healthcheck.metrics$', HealthcheckMetricsView.as_view(), name='healthcheck_metrics'),
 ]
@@ -1,4 +1,9 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
 import json
+import socketserver
+import sys
+import threading
+import time
 
 from django.test import SimpleTestCase
 
@@ -8,3 +13,79 @@ class TestCase(SimpleTestCase):
         self.assertEqual(response.status_code, status_code)
         json_response = json.loads(response.content.decode('utf-8'))
         self.assertEqual(json_response, expected_data)
+
+
+class StubHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    Local HTTP/1.1 server for URL healthcheck tests that records the client
+    address of every request, so connection reuse can be checked
+    """
+    daemon_threads = True
+
+    def __init__(self, status=200, body=b'OK', content_type='text/plain', chunk_size=None, delay=0):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.requests = []
+        super().__init__(('127.0.0.1', 0), StubHTTPRequestHandler)
+
+    @property
+    def url(self):
+        return 'http://%s:%s/' % self.server_address
+
+    @property
+    def connections(self):
+        return {client_address for client_address, path in self.requests}
+
+    def handle_error(self, request, client_address):
+        # clients stop waiting for delayed responses when they time out
+        if not isinstance(sys.exc_info()[1], OSError):
+            super().handle_error(request, client_address)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, args=(0.01,), daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+class StubHTTPRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # noqa: N802
+        self.server.requests.append((self.client_address, self.path))
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', self.server.content_type)
+        if self.server.chunk_size:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.write_chunks()
+        else:
+            self.send_header('Content-Length', str(len(self.server.body)))
+            self.end_headers()
+            self.wfile.write(self.server.body)
+
+    do_POST = do_GET  # noqa: N815
+
+    def write_chunks(self):
+        body, chunk_size = self.server.body, self.server.chunk_size
+        try:
+            for start in range(0, len(body), chunk_size):
+                chunk = body[start:start + chunk_size]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            # client stopped reading
+            pass
+
+    def log_message(self, *args):
+        pass